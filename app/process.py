@@ -2,9 +2,11 @@ from typing import Any
 
 import gspread
 
+from utils.sheet_operator import WorksheetSnapshot
+
 
 def get_row_run_index(
-        worksheet: gspread.worksheet.Worksheet,
+        worksheet: gspread.worksheet.Worksheet | WorksheetSnapshot,
         col_check_index: int = 2,
         value_check: Any = "1",
 ) -> list[int]:
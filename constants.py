@@ -1,6 +1,8 @@
 import os
 
 KEY_PATH = "key.json"
+TOKEN_CACHE_PATH = "user_data/token_cache.json"
+TOKEN_REFRESH_MARGIN = 300
 DATA_PATH = "storage/output.json"
 RETRIES_TIME = 20
 DEFAULT_URL = "https://www.bijiaqi.com/"
@@ -10,9 +12,39 @@ BLACKLIST_SHEET_NAME = "Blacklist"
 DESTINATION_RANGE = "G{n}:Q{n}"
 INFORMATION_RANGE = "G{n}:H{n}"
 TIMEOUT = 15
+SHEETS_HTTP_TIMEOUT = 30
+SHEETS_API_ROOT = "https://sheets.googleapis.com"
+DRIVE_API_ROOT = "https://www.googleapis.com"
+SHEETS_READS_PER_MINUTE = 60
+SHEETS_WRITES_PER_MINUTE = 60
+SHEETS_QUOTA_BACKOFF = 30
+SHEETS_QUOTA_RETRIES = 3
+SHEETS_MAX_CELLS_PER_UPDATE = 10000
+SHEETS_MAX_BYTES_PER_UPDATE = 1000000
+REMOTE_CELL_WORKERS = 4
+REMOTE_CELL_CACHE_SIZE = 1024
+REMOTE_CELL_CACHE_TTL = 300
+REMOTE_CELL_CACHE_STALE_TTL = 3600
+REVISION_GATE_MAX_SKIP_SECONDS = 600
+IM_CONNECT_TIMEOUT = 5
+IM_READ_TIMEOUT = 20
+IM_HTTP_RETRIES = 2
+IM_HTTP_POOL_SIZE = 4
+IM_HOST_CONCURRENCY = 2
+IM_COOKIE_SYNC_SECONDS = 600
+IM_PREFETCH_WORKERS = 4
+IM_PREFETCH_LOOKAHEAD = 4
+MARKET_CACHE_TTL = 20
+MARKET_CACHE_SIZE = 256
+MARKET_POLL_FLOOR = 0
+MARKET_POLL_CEILING = 900
+MARKET_POLL_STEP = 60
+OFFER_HISTORY_RETENTION_DAYS = 30
 REFRESH_TIME = 10
 LOG_FILE = "function_calls.log"
 LOG_LEVEL = "INFO"
 LOG_FORMAT = "%(asctime)s - %(message)s"
+LOG_FLUSH_ROWS = 20
+LOG_FLUSH_SECONDS = 60
 
 TEMPLATE_FOLDER = os.path.join(os.path.dirname(__file__), "storage", "pa_template")
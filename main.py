@@ -1,9 +1,10 @@
 import os
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Hashable, Tuple
 
 from dotenv import load_dotenv
 from gspread.exceptions import APIError
@@ -14,19 +15,71 @@ import constants
 from app.process import get_row_run_index
 from decorator.retry import retry
 from decorator.time_execution import time_execution
-from model.payload import Row
+from model.payload import Row, RowCache
 from model.sheet_model import IM
 from utils.exceptions import PACrawlerError
 from utils.ggsheet import GSheet, Sheet
-from utils.im_utils import get_im_min_price, EditPrice, calc_min_quantity, process_change_price, login_first, \
-    create_selenium_driver, get_list_product, PriceItem
+from utils.im_utils import EditPrice, calc_min_quantity, process_change_price, login_first, \
+    create_selenium_driver, fetch_market_payload, iter_offers, select_offers, market_schedule_key, PriceItem
+from utils.im_client import ItemManiaClient
 from utils.logger import setup_logging
+from utils.market_json import OfferRecord
+from utils.market_cache import MarketSnapshotCache
+from utils.market_prefetch import MarketPrefetcher
+from utils.market_scheduler import MarketScheduler
+from utils.offer_history import OfferHistoryStore
+from utils.quota import quota_governor
+from utils.remote_cells import RemoteCellResolver, RemoteCellCache
+from utils.revision_gate import RevisionGate
+from utils.sheet_operator import WorksheetSnapshot, SheetWriteBuffer
 
 ### SETUP ###
 load_dotenv("settings.env")
 
 setup_logging()
 gs = GSheet()
+quota_governor.configure(
+    reads_per_minute=float(os.getenv("SHEETS_READS_PER_MINUTE", constants.SHEETS_READS_PER_MINUTE)),
+    writes_per_minute=float(os.getenv("SHEETS_WRITES_PER_MINUTE", constants.SHEETS_WRITES_PER_MINUTE)),
+)
+remote_cell_cache = RemoteCellCache(
+    maxsize=int(os.getenv("REMOTE_CELL_CACHE_SIZE", constants.REMOTE_CELL_CACHE_SIZE)),
+    ttl=float(os.getenv("REMOTE_CELL_CACHE_TTL", constants.REMOTE_CELL_CACHE_TTL)),
+    stale_ttl=float(os.getenv("REMOTE_CELL_CACHE_STALE_TTL", constants.REMOTE_CELL_CACHE_STALE_TTL)),
+)
+row_cache = RowCache()
+im_client = ItemManiaClient(
+    connect_timeout=float(os.getenv("IM_CONNECT_TIMEOUT", constants.IM_CONNECT_TIMEOUT)),
+    read_timeout=float(os.getenv("IM_READ_TIMEOUT", constants.IM_READ_TIMEOUT)),
+    retries=int(os.getenv("IM_HTTP_RETRIES", constants.IM_HTTP_RETRIES)),
+    cookie_sync_seconds=float(os.getenv("IM_COOKIE_SYNC_SECONDS", constants.IM_COOKIE_SYNC_SECONDS)),
+)
+market_cache = MarketSnapshotCache(
+    ttl=float(os.getenv("MARKET_CACHE_TTL", constants.MARKET_CACHE_TTL)),
+)
+market_scheduler = MarketScheduler(
+    floor=float(os.getenv("MARKET_POLL_FLOOR", constants.MARKET_POLL_FLOOR)),
+    ceiling=float(os.getenv("MARKET_POLL_CEILING", constants.MARKET_POLL_CEILING)),
+    step=float(os.getenv("MARKET_POLL_STEP", constants.MARKET_POLL_STEP)),
+)
+# Market snapshots are kept on disk only when a history path is configured
+offer_history = OfferHistoryStore(
+    os.environ["OFFER_HISTORY_PATH"],
+    retention_days=float(os.getenv("OFFER_HISTORY_RETENTION_DAYS", constants.OFFER_HISTORY_RETENTION_DAYS)),
+) if os.getenv("OFFER_HISTORY_PATH") else None
+market_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("IM_PREFETCH_WORKERS", constants.IM_PREFETCH_WORKERS)),
+)
+revision_gate = RevisionGate(
+    probe=gs.get_revision,
+    max_skip_seconds=float(os.getenv("REVISION_GATE_MAX_SKIP_SECONDS", constants.REVISION_GATE_MAX_SKIP_SECONDS)),
+)
+# Config snapshot from the last full read, reused while the spreadsheet is unchanged
+_last_snapshot: Optional[WorksheetSnapshot] = None
+# Log cells whose flush failed, carried into the next cycle's buffer
+_pending_log_writes: Optional[SheetWriteBuffer] = None
+# Last competitor payload per polling key, reused while the market is not due
+_market_payloads: Dict[Hashable, Dict[str, Any]] = {}
 
 
 @dataclass
@@ -96,67 +149,200 @@ def process(
     try:
         worksheet = sheet.open_worksheet(os.getenv("SHEET_NAME"))  # type: ignore
     except APIError as e:
-        print("Quota exceeded, sleeping for 60 seconds")
-        time.sleep(60)
+        # The governor already paused and retried; later calls wait for their slot
+        print("Quota exceeded, skipping this cycle")
         return
     except Exception as e:
         print(f"Error getting worksheet: {e}")
         return
-    row_indexes = get_row_run_index(worksheet=worksheet)
+    try:
+        snapshot = read_config_snapshot(sheet.sheet_id, worksheet)
+    except APIError as e:
+        if e.code != 429:
+            # The cached worksheet may have been renamed or deleted
+            print(f"Error reading worksheet, reopening it next cycle: {e}")
+            gsheet.invalidate(sheet.sheet_id)
+            return
+        # The governor already paused and retried; later calls wait for their slot
+        print("Quota exceeded, skipping this cycle")
+        return
+    except Exception as e:
+        print(f"Error reading worksheet: {e}")
+        gsheet.invalidate(sheet.sheet_id)
+        return
+    row_indexes = get_row_run_index(worksheet=snapshot)
+    log_buffer = create_log_buffer(worksheet)
+    try:
+        rows = load_rows(snapshot, row_indexes, log_buffer)
+        prefetcher = start_prefetch(browser, plan_market_fetches(rows))
+        try:
+            resolver = RemoteCellResolver(constants.KEY_PATH, cache=remote_cell_cache, revision_gate=revision_gate)
+            for row in rows:
+                for ref in row.im.remote_cell_refs():
+                    resolver.add(ref)
+            resolver.resolve()
+            print(f"Remote cell cache: {remote_cell_cache.stats()}")
+            for position, row in enumerate(rows):
+                if log_buffer.is_due():
+                    revision_gate.own_write(sheet.sheet_id, log_buffer.flush)
+                process_row(browser, row, prefetcher.take(position), resolver, log_buffer)
+            print(f"Market cache: {market_cache.stats()}")
+        finally:
+            prefetcher.cancel()
+    finally:
+        finish_log_buffer(log_buffer, sheet.sheet_id)
+
+
+def plan_market_fetches(rows: List[Row]) -> List[Tuple[Row, Optional[Hashable], bool]]:
+    """
+    Pair every row with its polling key and whether its market must be
+    fetched this cycle. Every row is still repriced, so remote min/max, stock
+    and config edits always apply; rows of a market that is not due reuse
+    the market's last payload instead of fetching it again.
+    """
+    plan = []
+    for row in rows:
+        try:
+            key = market_schedule_key(row.im)
+        except Exception:
+            # A bad compare URL is reported when the row is processed
+            plan.append((row, None, True))
+            continue
+        due = market_scheduler.is_due(key) or key not in _market_payloads
+        plan.append((row, key, due))
+    keys = {key for _, key, _ in plan}
+    for key in list(_market_payloads):
+        if key not in keys:
+            del _market_payloads[key]
+    reused = sum(1 for _, _, due in plan if not due)
+    if reused:
+        print(f"Reusing the last market data for {reused} rows whose market is not due, {market_scheduler.stats()}")
+    return plan
+
+
+def fetch_row_market(item: Tuple[Row, Optional[Hashable], bool]) -> Dict[str, Any]:
+    row, key, due = item
+    if not due:
+        return _market_payloads[key]
+    payload = fetch_market_payload(row.im, client=im_client, cache=market_cache, history=offer_history)
+    if key is not None:
+        _market_payloads[key] = payload
+    return payload
+
+
+def start_prefetch(
+    browser: WebDriver,
+    plan: List[Tuple[Row, Optional[Hashable], bool]],
+) -> MarketPrefetcher[Tuple[Row, Optional[Hashable], bool]]:
+    # WebDriver is not thread safe: copy its cookies here, the workers only
+    # use the client's cookie jar
+    try:
+        im_client.sync_cookies_if_needed(browser)
+    except Exception as e:
+        print(f"Error syncing browser cookies: {e}")
+    return MarketPrefetcher(
+        market_executor,
+        fetch_row_market,
+        plan,
+        lookahead=int(os.getenv("IM_PREFETCH_LOOKAHEAD", constants.IM_PREFETCH_LOOKAHEAD)),
+    )
+
+
+def read_config_snapshot(
+    sheet_id: str,
+    worksheet,
+) -> WorksheetSnapshot:
+    global _last_snapshot
+    # Always probe, so the first full read already records a baseline revision
+    unchanged = revision_gate.is_unchanged(sheet_id)
+    if unchanged and _last_snapshot is not None and _last_snapshot.worksheet is worksheet:
+        print("Config sheet unchanged, reusing last snapshot")
+        return _last_snapshot
+    snapshot = WorksheetSnapshot.read(worksheet, [IM])
+    revision_gate.mark_read(sheet_id)
+    _last_snapshot = snapshot
+    return snapshot
+
+
+def load_rows(
+    snapshot: WorksheetSnapshot,
+    row_indexes: List[int],
+    log_buffer: SheetWriteBuffer,
+) -> List[Row]:
+    row_cache.prune(row_indexes)
+    rows = []
     for index in row_indexes:
-        print(f"Row: {index}")
         try:
-            row = Row.from_row_index(worksheet, index)
+            row = Row.from_snapshot(snapshot, index, cache=row_cache)
         except Exception as e:
-            print(f"Error getting row: {e}")
+            print(f"Error getting row {index}: {e}")
             _current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            write_to_log_cell(worksheet, index, "Error: " + _current_time, log_type="time")
-            continue
-        if not isinstance(row, Row):
+            write_to_log_cell(log_buffer, index, "Error: " + _current_time, log_type="time")
             continue
-        try:
-            prod_list = get_list_product(browser, row.im)
-            min_price_sheet = row.im.get_im_min_price()
-            max_price_sheet = row.im.get_im_max_price()
-            competitor_item = get_im_min_price(prod_list, min_price_sheet, max_price_sheet)
-            max_stock = row.im.get_im_stock()
-
-            if competitor_item is None:
-                print("No offer in range, set to max")
-                final_price = max_price_sheet
-            else:
-                final_price = calculate_final_price(competitor_item, row.im, min_price_sheet, max_price_sheet)
-            final_price = final_price * row.im.IM_QUANTITY_GET_PRICE
-            edit_object = EditPrice(
-                price=final_price,
-                quantity_per_sell=row.im.IM_QUANTITY_GET_PRICE,
-                min_quantity=calc_min_quantity(final_price, row.im),
-                max_quantity=max_stock,
-                price_reduction=row.im.IM_DONGIA_GIAM_MIN,
-            )
-
-            print(edit_object)
-            process_change_price(browser, row.im, edit_object)
-
-            if competitor_item:
-                print(f"Competitor price: {competitor_item.price}")
-
-            price_log_str = _create_log_price(edit_object, prod_list, min_price_sheet, max_price_sheet, competitor_item)
-            write_to_log_cell(worksheet, index, price_log_str, log_type="price")
-            try:
-                _row_time_sleep = float(os.getenv("SLEEP_TIME_EACH_ROUND"))
-                print(f"Sleeping for {_row_time_sleep} seconds")
-                time.sleep(_row_time_sleep)
-            except Exception as e:
-                print("No row time sleep, sleeping for 3 seconds by default")
-                time.sleep(3)
+        if isinstance(row, Row):
+            rows.append(row)
+    return rows
 
+
+def process_row(
+    browser: WebDriver,
+    row: Row,
+    market_payload: Future,
+    resolver: RemoteCellResolver,
+    log_buffer: SheetWriteBuffer,
+):
+    index = row.row_index
+    print(f"Row: {index}")
+    try:
+        payload = market_payload.result()
+        min_price_sheet = row.im.get_im_min_price(resolver)
+        max_price_sheet = row.im.get_im_max_price(resolver)
+        selection = select_offers(iter_offers(payload, row.im), min_price_sheet, max_price_sheet)
+        competitor_item = selection.best
+        # Volatility is judged on the market's cheapest offers, which do not
+        # depend on the row's price band
+        market_scheduler.observe(
+            market_schedule_key(row.im),
+            tuple((offer.trade_money, offer.seller_id) for offer in selection.cheapest),
+        )
+        max_stock = row.im.get_im_stock(resolver)
+
+        if competitor_item is None:
+            print("No offer in range, set to max")
+            final_price = max_price_sheet
+        else:
+            final_price = calculate_final_price(competitor_item, row.im, min_price_sheet, max_price_sheet)
+        final_price = final_price * row.im.IM_QUANTITY_GET_PRICE
+        edit_object = EditPrice(
+            price=final_price,
+            quantity_per_sell=row.im.IM_QUANTITY_GET_PRICE,
+            min_quantity=calc_min_quantity(final_price, row.im),
+            max_quantity=max_stock,
+            price_reduction=row.im.IM_DONGIA_GIAM_MIN,
+        )
+
+        print(edit_object)
+        process_change_price(browser, row.im, edit_object)
+
+        if competitor_item:
+            print(f"Competitor price: {competitor_item.price}")
+
+        price_log_str = _create_log_price(edit_object, selection.cheapest, min_price_sheet, max_price_sheet, competitor_item)
+        write_to_log_cell(log_buffer, index, price_log_str, log_type="price")
+        try:
+            _row_time_sleep = float(os.getenv("SLEEP_TIME_EACH_ROUND"))
+            print(f"Sleeping for {_row_time_sleep} seconds")
+            time.sleep(_row_time_sleep)
         except Exception as e:
-            print(f"Error calculating price change: {e}")
-            continue
-        _current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-        write_to_log_cell(worksheet, index, _current_time, log_type="time")
-        print("Next row...")
+            print("No row time sleep, sleeping for 3 seconds by default")
+            time.sleep(3)
+
+    except Exception as e:
+        print(f"Error calculating price change: {e}")
+        return
+    _current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    write_to_log_cell(log_buffer, index, _current_time, log_type="time")
+    print("Next row...")
 
 
 # def create_selenium_driver():
@@ -195,6 +381,28 @@ def calculate_final_price(
     return final_price
 
 
+def create_log_buffer(worksheet) -> SheetWriteBuffer:
+    global _pending_log_writes
+    log_buffer = SheetWriteBuffer(
+        worksheet,
+        flush_rows=int(os.getenv("LOG_FLUSH_ROWS", constants.LOG_FLUSH_ROWS)),
+        flush_seconds=float(os.getenv("LOG_FLUSH_SECONDS", constants.LOG_FLUSH_SECONDS)),
+    )
+    if _pending_log_writes is not None:
+        log_buffer.merge(_pending_log_writes)
+        _pending_log_writes = None
+    return log_buffer
+
+
+def finish_log_buffer(log_buffer: SheetWriteBuffer, sheet_id: str):
+    global _pending_log_writes
+    if not log_buffer.cells:
+        return
+    if not revision_gate.own_write(sheet_id, log_buffer.flush):
+        print(f"Keeping {len(log_buffer.cells)} log cells for the next cycle")
+        _pending_log_writes = log_buffer
+
+
 def write_to_log_cell(
     worksheet,
     row_index,
@@ -216,7 +424,7 @@ def write_to_log_cell(
 
 def _create_log_price(
     listing_details: EditPrice,
-    competitor_offers: List[Dict[str, Any]],
+    competitor_offers: List[OfferRecord],
     sheet_min_price: float,
     sheet_max_price: float,
     comparison_item: Optional[PriceItem]
@@ -226,7 +434,7 @@ def _create_log_price(
 
     Args:
         listing_details: Đối tượng EditPrice chứa thông tin giá và số lượng sẽ được cập nhật.
-        competitor_offers: Danh sách đầy đủ các offer của đối thủ.
+        competitor_offers: Các offer rẻ nhất của đối thủ, xếp theo trade_money tăng dần.
         sheet_min_price: Giá tối thiểu được cấu hình trong sheet.
         sheet_max_price: Giá tối đa được cấu hình trong sheet.
         comparison_item: Đối tượng PriceItem của đối thủ được dùng để so sánh giá.
@@ -259,7 +467,7 @@ def _create_log_price(
         offer_details = "\nKhông có offer nào thấp hơn."
     else:
         offer_lines = [
-            f"{index}/ {item.get('trade_subject', 'N/A')} price = {item.get('trade_money', 'N/A')};"
+            f"{index}/ {item.trade_subject or 'N/A'} price = {item.trade_money};"
             for index, item in enumerate(competitor_offers[:5], start=1)
         ]
         offer_details = "\n" + "\n".join(offer_lines)
@@ -274,7 +482,7 @@ if __name__ == "__main__":
     print("Starting...")
     gsheet = GSheet(constants.KEY_PATH)
     sd = create_selenium_driver()
-    login_first(sd)
+    login_first(sd, client=im_client)
     while True:
         try:
             process(gsheet, sd)
@@ -6,7 +6,8 @@ from pydantic import BaseModel, ConfigDict
 
 from model.crawl_model import OfferItem, StockNumInfo
 from model.enums import StockType
-from utils.sheet_operator import query_multi_model_from_worksheet
+from utils.sheet_operator import query_multi_model_from_worksheet, query_multi_model_from_snapshot, \
+    WorksheetSnapshot
 from .sheet_model import IM
 
 
@@ -85,6 +86,43 @@ class Product_:
     HESONHANDONGIA3: Optional[float] = field(default=None)
 
 
+class RowCache:
+    """
+    Validated models per row, keyed by a hash of the row's model columns.
+    Rows whose values did not change since the last cycle reuse the same
+    model instances, together with everything the models cached on themselves.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[int, tuple[str, list]] = {}
+
+    def get(
+            self,
+            row_index: int,
+            digest: str,
+    ) -> list | None:
+        entry = self._entries.get(row_index)
+        if entry is not None and entry[0] == digest:
+            return entry[1]
+        return None
+
+    def put(
+            self,
+            row_index: int,
+            digest: str,
+            models: list,
+    ) -> None:
+        self._entries[row_index] = (digest, models)
+
+    def prune(
+            self,
+            row_indexes: list[int],
+    ) -> None:
+        keep = set(row_indexes)
+        for row_index in [index for index in self._entries if index not in keep]:
+            del self._entries[row_index]
+
+
 class Row:
     row_index: int
     im: IM
@@ -114,3 +152,26 @@ class Row:
             )
         except Exception as e:
             raise Exception(f"Error getting row: {e}")
+
+    @staticmethod
+    def from_snapshot(
+            snapshot: WorksheetSnapshot,
+            row_index: int,
+            cache: RowCache | None = None,
+    ) -> "Row":
+        try:
+            if cache is None:
+                models = query_multi_model_from_snapshot(snapshot, [IM], row_index)
+            else:
+                digest = snapshot.row_digest(row_index, [IM])
+                models = cache.get(row_index, digest)
+                if models is None:
+                    models = query_multi_model_from_snapshot(snapshot, [IM], row_index)
+                    cache.put(row_index, digest, models)
+            return Row(
+                row_index,
+                snapshot.worksheet,
+                *models,  # type: ignore
+            )
+        except Exception as e:
+            raise Exception(f"Error getting row: {e}")
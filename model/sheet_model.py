@@ -1,3 +1,4 @@
+from functools import cached_property
 from typing import Annotated
 
 from pydantic import BaseModel
@@ -5,6 +6,22 @@ from pydantic.fields import FieldInfo
 
 from utils.ggsheet import GSheet
 from utils.google_api import StockManager
+from utils.keyword_matcher import KeywordMatcher, get_keyword_matcher
+from utils.remote_cells import CellRef, RemoteCellResolver
+
+
+def _remote_ref(
+        spreadsheet_id: str | None,
+        sheet_name: str | None,
+        cell: str | None,
+) -> CellRef | None:
+    if not spreadsheet_id:
+        return None
+    return spreadsheet_id, f"'{sheet_name}'!{cell}"
+
+
+def _split_keywords(keywords: str | None) -> list[str]:
+    return [keyword.strip() for keyword in (keywords or '').split(',') if keyword.strip()]
 
 
 class BaseGSheetModel(BaseModel):
@@ -285,8 +302,39 @@ class IM(BaseGSheetModel):
     IM_CELL_STOCK: Annotated[str | None, "X"] = ''
     IM_MINUPDATESTOCK: Annotated[int | None, "Y"] = 0
 
-    def get_im_min_price(self) -> float:
+    # Derived values are cached on the instance; unchanged rows reuse the
+    # instance across cycles (see model.payload.RowCache)
+    @cached_property
+    def include_keywords(self) -> list[str]:
+        return _split_keywords(self.IM_INCLUDE_KEYWORD)
+
+    @cached_property
+    def exclude_keywords(self) -> list[str]:
+        return _split_keywords(self.IM_EXCLUDE_KEYWORD)
+
+    @cached_property
+    def keyword_matcher(self) -> KeywordMatcher:
+        return get_keyword_matcher(tuple(self.include_keywords), tuple(self.exclude_keywords))
+
+    @cached_property
+    def min_price_ref(self) -> CellRef | None:
+        return _remote_ref(self.IM_ID_SHEET_MIN, self.IM_SHEET_MIN, self.IM_CELL_MIN)
+
+    @cached_property
+    def max_price_ref(self) -> CellRef | None:
+        return _remote_ref(self.IM_ID_SHEET_MAX, self.IM_SHEET_MAX, self.IM_CELL_MAX)
+
+    @cached_property
+    def stock_ref(self) -> CellRef | None:
+        return _remote_ref(self.IM_ID_SHEET_STOCK, self.IM_SHEET_STOCK, self.IM_CELL_STOCK)
+
+    def remote_cell_refs(self) -> list[CellRef | None]:
+        return [self.min_price_ref, self.max_price_ref, self.stock_ref]
+
+    def get_im_min_price(self, resolver: RemoteCellResolver | None = None) -> float:
         try:
+            if resolver is not None:
+                return float(resolver.get(self.min_price_ref))  # type: ignore
             sheet_manager = StockManager(self.IM_ID_SHEET_MIN)
             cell_value = sheet_manager.get_cell_float_value(f"'{self.IM_SHEET_MIN}'!{self.IM_CELL_MIN}")
             return float(cell_value)  # type: ignore
@@ -294,8 +342,10 @@ class IM(BaseGSheetModel):
             print("No min price IM")
             return 0.0
 
-    def get_im_max_price(self) -> int:
+    def get_im_max_price(self, resolver: RemoteCellResolver | None = None) -> int:
         try:
+            if resolver is not None:
+                return int(float(resolver.get(self.max_price_ref)))  # type: ignore
             sheet_manager = StockManager(self.IM_ID_SHEET_MAX)
             cell_value = sheet_manager.get_cell_float_value(f"'{self.IM_SHEET_MAX}'!{self.IM_CELL_MAX}")
             return int(cell_value)  # type: ignore
@@ -303,11 +353,13 @@ class IM(BaseGSheetModel):
             print("No max price IM")
             return 999999
 
-    def get_im_stock(self) -> int:
+    def get_im_stock(self, resolver: RemoteCellResolver | None = None) -> int:
         try:
+            if resolver is not None:
+                return int(float(resolver.get(self.stock_ref)))  # type: ignore
             sheet_manager = StockManager(self.IM_ID_SHEET_STOCK)
             stock_value = sheet_manager.get_cell_float_value(f"'{self.IM_SHEET_STOCK}'!{self.IM_CELL_STOCK}")
             return int(stock_value)  # type: ignore
         except Exception as e:
             print("No stock value IM")
-            return -1
\ No newline at end of file
+            return -1
@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+
+import constants
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+
+
+class CredentialProvider:
+    """
+    Single source of service-account credentials for both the gspread and the
+    googleapiclient stacks, one per key file.
+
+    Access tokens are kept in memory and in a small on-disk cache, so a restart
+    within the token lifetime needs no token exchange. A background thread
+    refreshes the token `refresh_margin` seconds before it expires, ahead of
+    google-auth's own expiry check, so requests never refresh inline.
+    """
+    _providers: dict[str, "CredentialProvider"] = {}
+    _providers_lock = threading.Lock()
+
+    def __init__(
+            self,
+            key_path: str,
+            cache_path: str = constants.TOKEN_CACHE_PATH,
+            refresh_margin: float = constants.TOKEN_REFRESH_MARGIN,
+    ) -> None:
+        self.key_path = key_path
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+        self.credentials = Credentials.from_service_account_file(key_path, scopes=SCOPES)
+        self._lock = threading.Lock()
+        if not self._load_cached_token():
+            self.refresh()
+        threading.Thread(target=self._refresh_loop, name="token-refresh", daemon=True).start()
+
+    @classmethod
+    def for_key(cls, key_path: str = constants.KEY_PATH) -> "CredentialProvider":
+        with cls._providers_lock:
+            provider = cls._providers.get(key_path)
+            if provider is None:
+                provider = cls._providers[key_path] = CredentialProvider(key_path)
+            return provider
+
+    def _seconds_left(self) -> float:
+        if self.credentials.expiry is None:
+            return 0
+        # google-auth keeps expiry as a naive UTC datetime
+        return (self.credentials.expiry - datetime.utcnow()).total_seconds()
+
+    def _read_cache(self) -> dict:
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _load_cached_token(self) -> bool:
+        entry = self._read_cache().get(self.credentials.service_account_email)
+        if not entry:
+            return False
+        try:
+            self.credentials.token = entry["token"]
+            self.credentials.expiry = datetime.fromisoformat(entry["expiry"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return self._seconds_left() > self.refresh_margin
+
+    def _save_cached_token(self) -> None:
+        cache = self._read_cache()
+        cache[self.credentials.service_account_email] = {
+            "token": self.credentials.token,
+            "expiry": self.credentials.expiry.isoformat(),
+        }
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            fd = os.open(self.cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(cache, f)
+        except OSError as e:
+            print(f"Cannot write token cache {self.cache_path}: {e}")
+
+    def refresh(self) -> None:
+        with self._lock:
+            self.credentials.refresh(Request())
+            self._save_cached_token()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            time.sleep(max(self._seconds_left() - self.refresh_margin, 0))
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing access token: {e}")
+                time.sleep(30)
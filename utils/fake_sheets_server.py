@@ -0,0 +1,370 @@
+"""
+Local stand-in for the parts of the Google Sheets v4 API this tool uses, for
+offline load and latency testing without real credentials.
+
+Supported endpoints:
+    GET  /v4/spreadsheets/{id}                      spreadsheet metadata
+    GET  /v4/spreadsheets/{id}/values/{range}       values.get
+    GET  /v4/spreadsheets/{id}/values:batchGet      values.batchGet
+    PUT  /v4/spreadsheets/{id}/values/{range}       values.update
+    POST /v4/spreadsheets/{id}/values:batchUpdate   values.batchUpdate
+    GET  /drive/v3/files/{id}                       Drive file version / modifiedTime
+    GET  /__stats                                   request counters
+
+Grids are kept in memory and optionally loaded from / saved to a JSON file
+shaped like {"<spreadsheet_id>": {"<sheet title>": [["A1", "B1"], ...]}}.
+
+Point the tool at it with SHEETS_API_ENDPOINT=http://127.0.0.1:<port>; both
+the gspread and googleapiclient paths then skip credentials and talk to it.
+Drive file requests made through gspread are redirected there as well.
+
+    python -m utils.fake_sheets_server --port 8765 --data grids.json --latency 0.2 --quota-every 50
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, unquote, urlsplit
+
+_A1_PART_RE = re.compile(r"^([A-Za-z]*)(\d*)$")
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + ord(char) - ord("A") + 1
+    return index
+
+
+def _column_label(index: int) -> str:
+    label = ""
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        label = chr(ord("A") + remainder) + label
+    return label
+
+
+def _quote_title(title: str) -> str:
+    return "'" + title.replace("'", "''") + "'"
+
+
+class FakeSheetsBackend:
+    """In-memory spreadsheets plus the fault injection settings of the server."""
+
+    def __init__(
+            self,
+            spreadsheets: dict[str, dict[str, list[list[str]]]] | None = None,
+            data_path: str | None = None,
+            latency: float = 0,
+            quota_every: int = 0,
+            retry_after: float = 1,
+    ) -> None:
+        self.spreadsheets = spreadsheets if spreadsheets is not None else {}
+        self.data_path = data_path
+        self.latency = latency
+        self.quota_every = quota_every
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        # spreadsheet_id -> (version, modifiedTime), bumped on every write
+        self.revisions: dict[str, tuple[int, str]] = {}
+        self.requests = 0
+        self.counters: dict[str, int] = {}
+        if data_path and spreadsheets is None:
+            try:
+                with open(data_path, encoding="utf-8") as f:
+                    self.spreadsheets = json.load(f)
+            except FileNotFoundError:
+                pass
+
+    def save(self) -> None:
+        if self.data_path:
+            with open(self.data_path, "w", encoding="utf-8") as f:
+                json.dump(self.spreadsheets, f, ensure_ascii=False)
+
+    def count(self, operation: str) -> bool:
+        """Record a request; return False when it should be answered with a 429."""
+        with self.lock:
+            self.requests += 1
+            self.counters[operation] = self.counters.get(operation, 0) + 1
+            if self.quota_every and self.requests % self.quota_every == 0:
+                self.counters["quota_errors"] = self.counters.get("quota_errors", 0) + 1
+                return False
+            return True
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            return {"requests": self.requests, **self.counters}
+
+    def revision(self, spreadsheet_id: str) -> dict[str, Any]:
+        self._sheets(spreadsheet_id)
+        with self.lock:
+            version, modified_time = self.revisions.get(spreadsheet_id, (1, "1970-01-01T00:00:00.000Z"))
+        return {"version": str(version), "modifiedTime": modified_time}
+
+    def _touch(self, spreadsheet_id: str) -> None:
+        version = self.revisions.get(spreadsheet_id, (1, ""))[0] + 1
+        modified_time = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+        self.revisions[spreadsheet_id] = (version, modified_time)
+
+    def _sheets(self, spreadsheet_id: str) -> dict[str, list[list[str]]]:
+        try:
+            return self.spreadsheets[spreadsheet_id]
+        except KeyError:
+            raise LookupError(f"Requested entity was not found: {spreadsheet_id}")
+
+    def metadata(self, spreadsheet_id: str) -> dict[str, Any]:
+        sheets = self._sheets(spreadsheet_id)
+        return {
+            "spreadsheetId": spreadsheet_id,
+            "properties": {"title": spreadsheet_id, "locale": "en_US", "timeZone": "Etc/GMT"},
+            "sheets": [
+                {
+                    "properties": {
+                        "sheetId": index,
+                        "title": title,
+                        "index": index,
+                        "sheetType": "GRID",
+                        "gridProperties": {
+                            "rowCount": max(1000, len(grid)),
+                            "columnCount": max(26, max((len(row) for row in grid), default=0)),
+                        },
+                    }
+                }
+                for index, (title, grid) in enumerate(sheets.items())
+            ],
+        }
+
+    def _parse_range(
+            self,
+            spreadsheet_id: str,
+            range_name: str,
+    ) -> tuple[str, list[list[str]], int, int, int | None, int | None]:
+        """Return (title, grid, first_row, first_col, last_row, last_col); None means open-ended."""
+        sheets = self._sheets(spreadsheet_id)
+        title, _, a1 = range_name.rpartition("!")
+        if not title:
+            if _A1_PART_RE.match(a1.split(":")[0]) and a1 not in sheets:
+                title = next(iter(sheets))
+            else:
+                title, a1 = a1, ""
+        if title.startswith("'") and title.endswith("'"):
+            title = title[1:-1].replace("''", "'")
+        if title not in sheets:
+            raise ValueError(f"Unable to parse range: {range_name}")
+        grid = sheets[title]
+        if not a1:
+            return title, grid, 1, 1, None, None
+        start, _, end = a1.partition(":")
+        start_match, end_match = _A1_PART_RE.match(start), _A1_PART_RE.match(end or start)
+        if not start_match or not end_match:
+            raise ValueError(f"Unable to parse range: {range_name}")
+        first_col = _column_index(start_match.group(1)) or 1
+        first_row = int(start_match.group(2) or 1)
+        last_col = _column_index(end_match.group(1)) or None
+        last_row = int(end_match.group(2)) if end_match.group(2) else None
+        return title, grid, first_row, first_col, last_row, last_col
+
+    def get(
+            self,
+            spreadsheet_id: str,
+            range_name: str,
+            major_dimension: str = "ROWS",
+    ) -> dict[str, Any]:
+        with self.lock:
+            title, grid, first_row, first_col, last_row, last_col = self._parse_range(spreadsheet_id, range_name)
+            last_row = last_row or len(grid)
+            values = []
+            for row in grid[first_row - 1:last_row]:
+                cells = row[first_col - 1:last_col]
+                while cells and cells[-1] == "":
+                    cells = cells[:-1]
+                values.append(cells)
+        while values and not values[-1]:
+            values.pop()
+        if major_dimension == "COLUMNS":
+            width = max((len(row) for row in values), default=0)
+            values = [
+                [row[col] if col < len(row) else "" for row in values]
+                for col in range(width)
+            ]
+        end_label = f"{_column_label(last_col) if last_col else ''}{last_row}"
+        result: dict[str, Any] = {
+            "range": f"{_quote_title(title)}!{_column_label(first_col)}{first_row}:{end_label}",
+            "majorDimension": major_dimension,
+        }
+        if values:
+            result["values"] = values
+        return result
+
+    def update(
+            self,
+            spreadsheet_id: str,
+            range_name: str,
+            values: list[list[Any]],
+    ) -> dict[str, Any]:
+        with self.lock:
+            title, grid, first_row, first_col, _, _ = self._parse_range(spreadsheet_id, range_name)
+            for row_offset, row_values in enumerate(values):
+                row_index = first_row - 1 + row_offset
+                while len(grid) <= row_index:
+                    grid.append([])
+                row = grid[row_index]
+                for col_offset, value in enumerate(row_values):
+                    col_index = first_col - 1 + col_offset
+                    if len(row) <= col_index:
+                        row.extend([""] * (col_index + 1 - len(row)))
+                    row[col_index] = "" if value is None else str(value)
+            self._touch(spreadsheet_id)
+        width = max((len(row) for row in values), default=0)
+        return {
+            "spreadsheetId": spreadsheet_id,
+            "updatedRange": range_name,
+            "updatedRows": len(values),
+            "updatedColumns": width,
+            "updatedCells": sum(len(row) for row in values),
+        }
+
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    backend: FakeSheetsBackend
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: dict[str, Any], headers: dict[str, str] | None = None) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_error(self, status: int, message: str, reason: str) -> None:
+        headers = {"Retry-After": str(self.backend.retry_after)} if status == 429 else None
+        self._send(status, {"error": {"code": status, "message": message, "status": reason}}, headers)
+
+    def _body(self) -> dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _route(self, method: str) -> None:
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        if url.path == "/__stats":
+            self._send(200, self.backend.stats())
+            return
+        drive_match = re.match(r"^/drive/v3/files/([^/]+)$", url.path)
+        if drive_match and method == "GET":
+            self.backend.count("drive.files.get")
+            try:
+                self._send(200, self.backend.revision(drive_match.group(1)))
+            except LookupError as e:
+                self._send_error(404, str(e), "NOT_FOUND")
+            return
+        match = re.match(r"^/v4/spreadsheets/([^/:]+)(.*)$", url.path)
+        if not match:
+            self._send_error(404, f"Unknown endpoint: {url.path}", "NOT_FOUND")
+            return
+        spreadsheet_id, rest = match.group(1), match.group(2)
+        if rest.startswith("/values/"):
+            operation = "values.get" if method == "GET" else "values.update"
+        elif rest in ("/values:batchGet", "/values:batchUpdate"):
+            operation = "values." + rest.split(":")[1]
+        elif rest == "" and method == "GET":
+            operation = "metadata"
+        else:
+            self._send_error(404, f"Unknown endpoint: {url.path}", "NOT_FOUND")
+            return
+
+        if self.backend.latency:
+            time.sleep(self.backend.latency)
+        if not self.backend.count(operation):
+            self._send_error(429, "Quota exceeded for quota metric 'Read requests'", "RESOURCE_EXHAUSTED")
+            return
+
+        major_dimension = params.get("majorDimension", ["ROWS"])[0]
+        try:
+            if operation == "metadata":
+                self._send(200, self.backend.metadata(spreadsheet_id))
+            elif operation == "values.get":
+                self._send(200, self.backend.get(spreadsheet_id, unquote(rest[len("/values/"):]), major_dimension))
+            elif operation == "values.batchGet":
+                value_ranges = [
+                    self.backend.get(spreadsheet_id, range_name, major_dimension)
+                    for range_name in params.get("ranges", [])
+                ]
+                self._send(200, {"spreadsheetId": spreadsheet_id, "valueRanges": value_ranges})
+            elif operation == "values.update":
+                body = self._body()
+                response = self.backend.update(spreadsheet_id, unquote(rest[len("/values/"):]), body.get("values", []))
+                self.backend.save()
+                self._send(200, response)
+            else:
+                responses = [
+                    self.backend.update(spreadsheet_id, data["range"], data.get("values", []))
+                    for data in self._body().get("data", [])
+                ]
+                self.backend.save()
+                self._send(200, {
+                    "spreadsheetId": spreadsheet_id,
+                    "totalUpdatedCells": sum(response["updatedCells"] for response in responses),
+                    "responses": responses,
+                })
+        except LookupError as e:
+            self._send_error(404, str(e), "NOT_FOUND")
+        except ValueError as e:
+            self._send_error(400, str(e), "INVALID_ARGUMENT")
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_POST(self):
+        self._route("POST")
+
+
+def create_server(
+        backend: FakeSheetsBackend,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+) -> ThreadingHTTPServer:
+    handler = type("BoundFakeSheetsHandler", (FakeSheetsHandler,), {"backend": backend})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake Google Sheets v4 API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data", help="JSON file with the spreadsheet grids")
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to every request")
+    parser.add_argument("--quota-every", type=int, default=0, help="answer every Nth request with a 429")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After seconds sent with a 429")
+    args = parser.parse_args()
+
+    backend = FakeSheetsBackend(
+        data_path=args.data,
+        latency=args.latency,
+        quota_every=args.quota_every,
+        retry_after=args.retry_after,
+    )
+    server = create_server(backend, args.host, args.port)
+    print(f"Fake Sheets API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
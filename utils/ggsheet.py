@@ -1,29 +1,114 @@
 import gspread.urls
 import gspread.utils
-from oauth2client.service_account import ServiceAccountCredentials
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
 import gspread
 
+import constants
+from utils.google_api import SheetsServicePool, get_sheets_api_endpoint
+from utils.quota import quota_governor, request_kind, retry_after_seconds
+
+
+class GovernedHTTPClient(HTTPClient):
+    """
+    gspread HTTP client that paces requests through the shared quota governor
+    and honours the SHEETS_API_ENDPOINT override.
+    """
+
+    def request(self, method, endpoint, *args, **kwargs):
+        is_sheets = endpoint.startswith(constants.SHEETS_API_ROOT)
+        api_endpoint = get_sheets_api_endpoint()
+        if api_endpoint:
+            for root in (constants.SHEETS_API_ROOT, constants.DRIVE_API_ROOT):
+                if endpoint.startswith(root):
+                    endpoint = api_endpoint.rstrip("/") + endpoint[len(root):]
+        if not is_sheets:
+            # Drive calls have their own quota
+            return super().request(method, endpoint, *args, **kwargs)
+        kind = request_kind(method)
+        for attempt in range(constants.SHEETS_QUOTA_RETRIES + 1):
+            quota_governor.acquire(kind)
+            try:
+                return super().request(method, endpoint, *args, **kwargs)
+            except APIError as e:
+                if e.code != 429 or attempt == constants.SHEETS_QUOTA_RETRIES:
+                    raise
+                quota_governor.backoff(retry_after_seconds(e.response.headers.get("Retry-After")))
+
 
 class GSheet:
     client: gspread.client.Client
 
     def __init__(self, keypath="key.json"):
         self.client = self.__get_gspread(keypath)
+        # Opening a spreadsheet or worksheet costs a metadata request, so the
+        # handles are kept across cycles until invalidated
+        self._spreadsheets: dict[str, gspread.spreadsheet.Spreadsheet] = {}
+        self._worksheets: dict[tuple[str, str], gspread.worksheet.Worksheet] = {}
 
     def __get_gspread(self, keypath="key.json"):
-        scope = [
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive",
-        ]
-        creds = ServiceAccountCredentials.from_json_keyfile_name(keypath, scope)  # type: ignore
-        client = gspread.auth.authorize(creds)  # type: ignore
+        creds = SheetsServicePool.get_credentials(keypath)
+        client = gspread.auth.authorize(creds, http_client=GovernedHTTPClient)  # type: ignore
         return client
 
     def get_sheet(
             self,
             sheet_id,
     ) -> gspread.spreadsheet.Spreadsheet:
-        return self.client.open_by_key(sheet_id)
+        spreadsheet = self._spreadsheets.get(sheet_id)
+        if spreadsheet is None:
+            spreadsheet = self.client.open_by_key(sheet_id)
+            self._spreadsheets[sheet_id] = spreadsheet
+        return spreadsheet
+
+    def get_worksheet(
+            self,
+            sheet_id: str,
+            worksheet_name: str,
+    ) -> gspread.worksheet.Worksheet:
+        key = (sheet_id, worksheet_name)
+        worksheet = self._worksheets.get(key)
+        if worksheet is None:
+            try:
+                worksheet = self.get_sheet(sheet_id).worksheet(worksheet_name)
+            except gspread.exceptions.WorksheetNotFound:
+                self.invalidate(sheet_id)
+                raise
+            self._worksheets[key] = worksheet
+        return worksheet
+
+    def invalidate(
+            self,
+            sheet_id: str | None = None,
+            worksheet_name: str | None = None,
+    ) -> None:
+        """
+        Drop cached handles so they are reopened on next use. Without arguments
+        everything is dropped; with only sheet_id the spreadsheet and all of its
+        worksheets are dropped.
+        """
+        if sheet_id is None:
+            self._spreadsheets.clear()
+            self._worksheets.clear()
+            return
+        if worksheet_name is not None:
+            self._worksheets.pop((sheet_id, worksheet_name), None)
+            return
+        self._spreadsheets.pop(sheet_id, None)
+        for key in [key for key in self._worksheets if key[0] == sheet_id]:
+            del self._worksheets[key]
+
+    def get_revision(
+            self,
+            sheet_id: str,
+    ) -> str | None:
+        """Drive file version of a spreadsheet; it changes on every edit."""
+        response = self.client.http_client.request(
+            "get",
+            f"{gspread.urls.DRIVE_FILES_API_V3_URL}/{sheet_id}",
+            params={"fields": "version,modifiedTime", "supportsAllDrives": True},
+        )
+        return response.json().get("version")
 
     def read_sheet_data(self, sheet_id):
         sheet = self.get_sheet(sheet_id)
@@ -34,9 +119,7 @@ class GSheet:
                         sheet_name: str,
                         cell: str,
                         ) -> float:
-        spreadsheet = self.client.open_by_key(spreadsheet_id)
-
-        worksheet = spreadsheet.worksheet(sheet_name)
+        worksheet = self.get_worksheet(spreadsheet_id, sheet_name)
         value = worksheet.acell(cell).value
         return float(value)
 
@@ -59,7 +142,7 @@ class Sheet:
             self,
             worksheet_name: str,
     ) -> gspread.worksheet.Worksheet:
-        return self.sheet.worksheet(worksheet_name)
+        return self.gsheet.get_worksheet(self.sheet_id, worksheet_name)
 
     def __call__(self) -> gspread.spreadsheet.Spreadsheet:
         return self.sheet
@@ -1,24 +1,83 @@
-import time
+import os
+import threading
 
+import httplib2
+from google.auth.credentials import AnonymousCredentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
+from google.auth.credentials import Credentials
 
-from decorator.time_execution import time_execution
+import constants
+from utils.credentials import CredentialProvider
+from utils.quota import quota_governor, request_kind, retry_after_seconds
+
+
+def get_sheets_api_endpoint() -> str | None:
+    """
+    Override for the Sheets API root, e.g. the local utils.fake_sheets_server.
+    When set, requests are sent there without credentials.
+    """
+    return os.getenv("SHEETS_API_ENDPOINT") or None
+
+
+class GovernedAuthorizedHttp(AuthorizedHttp):
+    """AuthorizedHttp that paces requests through the shared quota governor."""
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        kind = request_kind(method)
+        for attempt in range(constants.SHEETS_QUOTA_RETRIES + 1):
+            quota_governor.acquire(kind)
+            response, content = super().request(uri, method, body=body, headers=headers, **kwargs)
+            if response.status != 429 or attempt == constants.SHEETS_QUOTA_RETRIES:
+                return response, content
+            quota_governor.backoff(retry_after_seconds(response.get("retry-after")))
+
+
+class SheetsServicePool:
+    """
+    Process-wide pool of authorized Sheets services keyed by credentials file.
+
+    Credentials come from the shared CredentialProvider, so gspread and the
+    API client use one cached, proactively refreshed token. httplib2
+    connections are not thread safe, so every thread gets its own keep-alive
+    service.
+    """
+    _local = threading.local()
+
+    @classmethod
+    def get_credentials(cls, credentials_file: str) -> Credentials:
+        if get_sheets_api_endpoint():
+            return AnonymousCredentials()
+        return CredentialProvider.for_key(credentials_file).credentials
+
+    @classmethod
+    def get_service(cls, credentials_file: str = "key.json"):
+        services = getattr(cls._local, "services", None)
+        if services is None:
+            services = cls._local.services = {}
+        service = services.get(credentials_file)
+        if service is None:
+            http = GovernedAuthorizedHttp(
+                cls.get_credentials(credentials_file),
+                http=httplib2.Http(timeout=constants.SHEETS_HTTP_TIMEOUT),
+            )
+            endpoint = get_sheets_api_endpoint()
+            service = build(
+                'sheets', 'v4', http=http, cache_discovery=False,
+                client_options={"api_endpoint": endpoint} if endpoint else None,
+            )
+            services[credentials_file] = service
+        return service
 
 
 class StockManager:
-    def __init__(self, spreadsheet_id: str):
-        self.credentials_file = "key.json"
+    def __init__(self, spreadsheet_id: str, credentials_file: str = "key.json"):
+        self.credentials_file = credentials_file
         self.spreadsheet_id = spreadsheet_id
-        time.sleep(1)
-        self.service = self._initialize_service()
-
-    def _initialize_service(self):
-        credentials = Credentials.from_service_account_file(
-            self.credentials_file,
-            scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"]
-        )
-        return build('sheets', 'v4', credentials=credentials)
+
+    @property
+    def service(self):
+        return SheetsServicePool.get_service(self.credentials_file)
 
     def get_cell_float_value(self, range_name: str) -> float:
         try:
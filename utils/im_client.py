@@ -0,0 +1,101 @@
+import threading
+import time
+from typing import Any, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from selenium.webdriver.chrome.webdriver import WebDriver
+from urllib3.util.retry import Retry
+
+import constants
+from utils.market_json import decode_market_payload
+
+
+class ItemManiaClient:
+    """
+    Pooled keep-alive HTTP client for the ItemMania ajax endpoints.
+
+    One requests.Session is shared by every fetch, so connections and TLS
+    sessions are reused across rows. Every request has connect/read timeouts,
+    and transient failures (connection errors, 429 and 5xx) are retried with
+    backoff. POST is retried too: the search endpoint only reads. The session
+    cookie jar mirrors the logged-in browser through `sync_cookies`; reading
+    the browser cookies is a WebDriver round trip, so `sync_cookies_if_needed`
+    only does it after a login, a failed fetch or every `cookie_sync_seconds`.
+
+    Every request goes to the same host, so `max_in_flight` caps how many
+    requests the client has open at once, whichever threads send them.
+    """
+    BASE_URL = "https://www.itemmania.com"
+
+    def __init__(
+            self,
+            connect_timeout: float = constants.IM_CONNECT_TIMEOUT,
+            read_timeout: float = constants.IM_READ_TIMEOUT,
+            retries: int = constants.IM_HTTP_RETRIES,
+            pool_size: int = constants.IM_HTTP_POOL_SIZE,
+            max_in_flight: int = constants.IM_HOST_CONCURRENCY,
+            cookie_sync_seconds: float = constants.IM_COOKIE_SYNC_SECONDS,
+    ) -> None:
+        self.timeout = (connect_timeout, read_timeout)
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=None,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.verify = False
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.cookie_sync_seconds = cookie_sync_seconds
+        self._cookies_synced_at: float | None = None
+
+    def sync_cookies(self, driver: WebDriver) -> None:
+        """Copy the browser cookies into the session. Must run on the WebDriver thread."""
+        cookies = driver.get_cookies()
+        with self._lock:
+            for cookie in cookies:
+                self.session.cookies.set(cookie['name'], cookie['value'])
+            self._cookies_synced_at = time.monotonic()
+
+    def sync_cookies_if_needed(self, driver: WebDriver) -> None:
+        with self._lock:
+            synced_at = self._cookies_synced_at
+        if synced_at is None or time.monotonic() - synced_at >= self.cookie_sync_seconds:
+            self.sync_cookies(driver)
+
+    def mark_cookies_stale(self) -> None:
+        """Sync the browser cookies again before the next fetch, e.g. after a login."""
+        with self._lock:
+            self._cookies_synced_at = None
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        with self._in_flight:
+            return self.session.post(self.BASE_URL + path, **kwargs)
+
+    def search(
+            self,
+            data: Dict[str, str],
+            headers: Dict[str, str],
+            cookies: Dict[str, str] | None = None,
+    ) -> Dict[str, Any]:
+        try:
+            response = self.post("/sell/ajax_list_search.php", data=data, headers=headers, cookies=cookies)
+            response.raise_for_status()
+            return decode_market_payload(response.content)
+        except Exception:
+            # An expired session shows up as an error status or a non-JSON page
+            self.mark_cookies_stale()
+            raise
+
+    def close(self) -> None:
+        self.session.close()
+
+
+default_im_client = ItemManiaClient()
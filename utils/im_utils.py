@@ -1,9 +1,13 @@
 import base64
+import heapq
 import math
 import os
 import time
 import re
-from typing import Optional, List, Dict, Union, Any
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain
+from typing import Optional, List, Dict, Union, Any, Iterable, Iterator, NamedTuple, Tuple
 from urllib.parse import parse_qs, urlparse, unquote
 
 import phpserialize
@@ -20,6 +24,10 @@ from selenium.webdriver.support.wait import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
 from model.sheet_model import IM
+from utils.im_client import ItemManiaClient, default_im_client
+from utils.market_cache import MarketKey, MarketSnapshotCache, market_key
+from utils.market_json import OfferRecord, offer_record, offer_records
+from utils.offer_history import OfferHistoryStore
 
 
 def handle_new_tab_popup(web_driver: webdriver.Chrome):
@@ -78,25 +86,35 @@ class QuantityItem(BaseModel):
     max: int
 
 
-class PriceItem(BaseModel):
+@dataclass(slots=True)
+class PriceItem:
     title: str
     min_quantity: float
     max_quantity: float
     price: float
     info: str
 
-    class Config:
-        arbitrary_types_allowed = True
 
+class MarketRequest(NamedTuple):
+    """Compiled ajax_list_search request of a compare URL. Shared; do not modify."""
+    game_code: str
+    server_code: str
+    search_goods: str
+    headers: Dict[str, str]
+    data: Dict[str, str]
+    cookies: Dict[str, str]
+    key: MarketKey
 
-def get_list_product(sd: WebDriver, im: IM):
+    @property
+    def market_name(self) -> str:
+        return f"{self.game_code}/{self.server_code}/{self.search_goods}"
+
+
+@lru_cache(maxsize=256)
+def compile_market_request(url: str) -> MarketRequest:
+    """Parse a compare URL once and build everything its ajax_list_search request needs."""
     try:
-        url = im.IM_PRODUCT_COMPARE
-        cookies = sd.get_cookies()
-        session_cookies = {cookie['name']: cookie['value'] for cookie in cookies}
-        session_cookies['common_search'] = build_common_search_cookie_from_url(url)
-        parsed_url = urlparse(url)
-        query_params = parse_qs(parsed_url.query)
+        query_params = parse_qs(urlparse(url).query)
 
         game_code = query_params.get('search_game', [''])[0]
         server_code = query_params.get('search_server', [''])[0]
@@ -128,94 +146,130 @@ def get_list_product(sd: WebDriver, im: IM):
             'credit_type': '1',
             'pinit': '1',
         }
+        cookies = {'common_search': _common_search_cookie(query_params)}
     except Exception as e:
         raise ValueError(f"Error parsing URL: {e}")
+    return MarketRequest(game_code, server_code, search_goods, headers, data, cookies, market_key(data))
 
-    try:
-        response = requests.post(
-            'https://www.itemmania.com/sell/ajax_list_search.php',
-            headers=headers,
-            cookies=session_cookies,
-            data=data,
-            verify=False
-        )
-        response.raise_for_status()
-        data = response.json()
-        items = extract_and_combine_trades(data, mode=im.IM_COMPARE_ALL)
-        filter_items = filter_trades_by_subject(items, im)
-        transformed_items = transform_trade_list(filter_items)
-        transformed_items.sort(key=lambda x: int(x.get('trade_money', 0)))
-        return transformed_items
-    except requests.RequestException as e:
-        raise ValueError(f"Error fetching data from ItemMania: {e}")
-
-
-def transform_trade_list(original_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    keys_to_keep = {
-        'seller_id',
-        'trade_money',
-        'ea_trade_money',
-        'trade_quantity',
-        'trade_subject',
-        'ea_range',
-        'max_quantity',
-        'min_quantity',
-        'min_trade_money',
-        'seller_rank',
-        'str_trade_kind',
-        'trade_kind'
-    }
-
-    return [{key: item.get(key) for key in keys_to_keep} for item in original_list]
 
+def market_schedule_key(im: IM) -> Tuple[Any, ...]:
+    """Polling key of a row: its market plus the filters applied to the market's offers."""
+    request = compile_market_request(im.IM_PRODUCT_COMPARE)
+    return request.key, tuple(im.include_keywords), tuple(im.exclude_keywords), im.IM_COMPARE_ALL
 
-def extract_and_combine_trades(raw_data_dict: Dict[str, Any], mode) -> List[Dict[str, Any]]:
-    if mode == None:
-        mode = 1
-
-    data = raw_data_dict.get('data', {})
-
-    g_list = data.get('g', [])
-    p_list = data.get('p', [])
-    power_data = data.get('power', {})
-    power_list = list(power_data.values())
-    if mode == 1:
-        # Combine 'g', 'p', and 'power' lists into one
-        combined_list = g_list + p_list + power_list
-    else:
-        # Combine 'g' and 'p' lists only
-        combined_list = g_list + p_list
-    return combined_list
 
+def fetch_market_payload(
+        im: IM,
+        client: Optional[ItemManiaClient] = None,
+        cache: Optional[MarketSnapshotCache] = None,
+        on_miss=None,
+        history: Optional[OfferHistoryStore] = None,
+) -> Dict[str, Any]:
+    """
+    Fetch the decoded ajax_list_search payload of a row's market. Does not
+    touch the WebDriver, so it can run on worker threads once the client
+    cookies are synced; `on_miss` runs right before a real network fetch.
 
-def filter_trades_by_subject(trade_list: List[Dict[str, Any]], im: IM) -> List[Dict[str, Any]]:
-    filtered_list = []
+    The payload may be shared with other rows of the same market and must
+    not be modified. Payloads fetched from the network, not from the cache,
+    are recorded in `history`.
+    """
+    client = client or default_im_client
+    request = compile_market_request(im.IM_PRODUCT_COMPARE)
+
+    def fetch_market():
+        if on_miss is not None:
+            on_miss()
+        payload = client.search(data=request.data, headers=request.headers, cookies=request.cookies)
+        if history is not None:
+            data = payload['data']
+            try:
+                offers = chain(data['g'], data['p'], data['power'].values())
+                history.record(request.market_name, offer_records(offers, warn=False))
+            except Exception as e:
+                print(f"Error recording offer history: {e}")
+        return payload
 
-    excl_str = im.IM_EXCLUDE_KEYWORD or ''
-    incl_str = im.IM_INCLUDE_KEYWORD or ''
+    try:
+        return cache.get(request.key, fetch_market) if cache else fetch_market()
+    except requests.RequestException as e:
+        raise ValueError(f"Error fetching data from ItemMania: {e}")
 
-    incl_keywords = [keyword.strip() for keyword in incl_str.split(',') if keyword.strip()]
-    excl_keywords = [keyword.strip() for keyword in excl_str.split(',') if keyword.strip()]
 
-    for item in trade_list:
-        if item.get('trade_state') == 'p':
+def iter_offers(raw_data_dict: Dict[str, Any], im: IM) -> Iterator[OfferRecord]:
+    """
+    Stream the offers of a payload that pass the row's filters as
+    OfferRecords. Offers without a numeric trade_money are skipped.
+    """
+    data = raw_data_dict.get('data', {})
+    sources = [data.get('g', []), data.get('p', [])]
+    if im.IM_COMPARE_ALL is None or im.IM_COMPARE_ALL == 1:
+        sources.append(data.get('power', {}).values())
+    matcher = im.keyword_matcher
+    for item in chain.from_iterable(sources):
+        if item.get('trade_state') == 'p' or not matcher.matches(item.get('trade_subject', '')):
             continue
-        subject = item.get('trade_subject', '')
+        record = offer_record(item)
+        if record is not None:
+            yield record
 
-        include_match = not incl_keywords or any(keyword in subject for keyword in incl_keywords)
 
-        exclude_match = excl_keywords and any(keyword in subject for keyword in excl_keywords)
+class OfferSelection(NamedTuple):
+    # Cheapest in-range offer by unit price, None if there is none
+    best: Optional[PriceItem]
+    # Up to k offers with the lowest trade_money, cheapest first
+    cheapest: List[OfferRecord]
 
-        if include_match and not exclude_match:
-            filtered_list.append(item)
 
-    return filtered_list
+def select_offers(
+        offers: Iterable[OfferRecord],
+        min_price_sheet: float,
+        max_price_sheet: float,
+        k: int = 5,
+) -> OfferSelection:
+    """
+    Single pass over `offers` that picks the in-range offer with the lowest
+    unit price (ties go to the lower trade_money, then the earlier offer) and
+    the k offers with the lowest trade_money, kept in a bounded heap.
+    """
+    best_key = None
+    best = None
+    heap: List[Tuple[int, int, OfferRecord]] = []
+    for seq, offer in enumerate(offers):
+        money = offer.trade_money
+        if len(heap) < k:
+            heapq.heappush(heap, (-money, -seq, offer))
+        elif (money, seq) < (-heap[0][0], -heap[0][1]):
+            heapq.heapreplace(heap, (-money, -seq, offer))
+        if min_price_sheet <= offer.unit_price <= max_price_sheet:
+            key = (offer.unit_price, money, seq)
+            if best_key is None or key < best_key:
+                best_key = key
+                best = offer
+    if not heap:
+        print("No product found in the list.")
+    elif best is None:
+        print("No items found within the specified price range.")
+    cheapest = [offer for _, _, offer in sorted(heap, reverse=True)]
+    if best is None:
+        return OfferSelection(None, cheapest)
+    return OfferSelection(
+        PriceItem(
+            title=best.trade_subject,
+            min_quantity=best.min_quantity,
+            max_quantity=best.max_quantity,
+            price=best.unit_price,
+            info=best.seller_id or 'cant get seller id'
+        ),
+        cheapest,
+    )
 
 
 def build_common_search_cookie_from_url(url: str) -> str:
-    parsed_url = urlparse(url)
-    query = parse_qs(parsed_url.query)
+    return _common_search_cookie(parse_qs(urlparse(url).query))
+
 
+def _common_search_cookie(query: Dict[str, List[str]]) -> str:
     # Extract values
     game_code = query.get('search_game', [''])[0]
     server_code = query.get('search_server', [''])[0]
@@ -246,49 +300,7 @@ def build_common_search_cookie_from_url(url: str) -> str:
     return encoded
 
 
-def get_im_min_price(list_product: Dict, min_price_sheet, max_price_sheet) -> Optional[PriceItem]:
-    try:
-        if not list_product:
-            print("No product found in the list.")
-            return None
-        filtered_list = []
-        for item in list_product:
-            _item_price = int(item.get('trade_money', '0'))
-            try:
-                trade_quantity = item.get('trade_quantity', '0')
-                if trade_quantity is None:
-                    trade_quantity = '0'  # Default to '0' if None
-                _item_quantity = int(trade_quantity)
-                if _item_quantity <= 0:
-                    raise ValueError("Quantity is zero or negative.")
-            except ValueError:
-                print(
-                    f"Invalid quantity for item {item.get('trade_subject', 'Unknown')}: {trade_quantity}, defaulting to 1")
-                _item_quantity = 1
-            _price = _item_price / _item_quantity
-            # _price = _item_price
-            if min_price_sheet <= _price <= max_price_sheet:
-                filtered_list.append(
-                    PriceItem(
-                        title=item.get('trade_subject', ''),
-                        min_quantity=item.get('min_quantity', 1),
-                        max_quantity=item.get('max_quantity', 99999),
-                        price=_price,
-                        info=item.get('seller_id', 'cant get seller id')
-                    )
-                )
-        if not filtered_list:
-            print("No items found within the specified price range.")
-            return None
-        min_price_item = min(filtered_list, key=lambda x: x.price)
-        return min_price_item
-
-    except Exception as e:
-        print(f"Error when get min price: {e}")
-        return None
-
-
-def login_first(web_driver: WebDriver):
+def login_first(web_driver: WebDriver, client: Optional[ItemManiaClient] = None):
     try:
         print("Login...")
         ###LOGIN###
@@ -302,6 +314,7 @@ def login_first(web_driver: WebDriver):
         click_element_by_text(web_driver, "로그인", "button")
         handle_new_tab_popup(web_driver)
         web_driver.minimize_window()
+        (client or default_im_client).mark_cookies_stale()
         return True
     except TimeoutException:
         print(f"Time out when logging in.")
@@ -323,7 +336,8 @@ def ceil_up(number: float, base: int):
     return int(result)
 
 
-class EditPrice(BaseModel):
+@dataclass(slots=True)
+class EditPrice:
     quantity_per_sell: int
     price: float
     min_quantity: int = 1
@@ -0,0 +1,47 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+
+def normalize_text(text: str) -> str:
+    # Korean can arrive as precomposed syllables or as separate jamo
+    return unicodedata.normalize("NFC", text)
+
+
+def _compile(keywords: tuple[str, ...]) -> re.Pattern | None:
+    if not keywords:
+        return None
+    return re.compile("|".join(re.escape(normalize_text(keyword)) for keyword in keywords))
+
+
+class KeywordMatcher:
+    """
+    Include/exclude substring filter for offer subjects.
+
+    Each keyword list is compiled into one alternation regex, so a subject is
+    scanned once per list instead of once per keyword. Keywords and subjects
+    are NFC-normalized; matching is case-sensitive, like the `in` checks it
+    replaces.
+    """
+
+    def __init__(
+            self,
+            include: tuple[str, ...],
+            exclude: tuple[str, ...],
+    ) -> None:
+        self._include = _compile(include)
+        self._exclude = _compile(exclude)
+
+    def matches(self, subject: str | None) -> bool:
+        subject = normalize_text(subject or '')
+        if self._include is not None and self._include.search(subject) is None:
+            return False
+        return self._exclude is None or self._exclude.search(subject) is None
+
+
+@lru_cache(maxsize=256)
+def get_keyword_matcher(
+        include: tuple[str, ...],
+        exclude: tuple[str, ...],
+) -> KeywordMatcher:
+    return KeywordMatcher(include, exclude)
@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+from cachetools import TTLCache
+
+import constants
+
+# Sorted form parameters of an ajax_list_search request
+MarketKey = tuple[tuple[str, str], ...]
+
+
+def market_key(form_data: Dict[str, str]) -> MarketKey:
+    return tuple(sorted(form_data.items()))
+
+
+class MarketSnapshotCache:
+    """
+    Short-lived cache of decoded ajax_list_search payloads keyed by market.
+
+    Rows that target the same market share one snapshot while it is younger
+    than `ttl`. Fetches are single-flight: a caller that asks for a market
+    already being fetched waits for that fetch instead of starting another.
+    Cached payloads are shared between rows, so callers must not mutate them.
+    """
+
+    def __init__(
+            self,
+            ttl: float = constants.MARKET_CACHE_TTL,
+            maxsize: int = constants.MARKET_CACHE_SIZE,
+    ) -> None:
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        with self._lock:
+            payload = self._cache.get(key)
+            if payload is not None:
+                self.hits += 1
+                return payload
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return flight.result()
+        try:
+            payload = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            flight.set_exception(e)
+            raise
+        with self._lock:
+            self._cache[key] = payload
+            del self._inflight[key]
+        flight.set_result(payload)
+        return payload
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "hits": self.hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+            }
@@ -0,0 +1,126 @@
+import json
+from typing import Any, Dict, Iterable, Iterator, NamedTuple, Optional
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+# Offer fields the repricing and the price log use
+TRADE_KEYS = (
+    'seller_id',
+    'trade_money',
+    'ea_trade_money',
+    'trade_quantity',
+    'trade_subject',
+    'ea_range',
+    'max_quantity',
+    'min_quantity',
+    'min_trade_money',
+    'seller_rank',
+    'str_trade_kind',
+    'trade_kind',
+)
+# Fields kept while decoding: TRADE_KEYS plus what the filters read
+OFFER_KEYS = TRADE_KEYS + ('trade_state',)
+
+
+class OfferRecord(NamedTuple):
+    """A competitor offer with its numbers already converted."""
+    unit_price: float
+    trade_money: int
+    trade_quantity: int
+    seller_id: str
+    trade_subject: str
+    min_quantity: float
+    max_quantity: float
+
+
+def _to_float(value: Any, default: float) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_trade_quantity(item: Dict[str, Any], warn: bool = True) -> int:
+    """trade_quantity of an offer, or 1 when it is missing, invalid or not positive."""
+    trade_quantity = item.get('trade_quantity', '0')
+    try:
+        if trade_quantity is None:
+            trade_quantity = '0'  # Default to '0' if None
+        quantity = int(trade_quantity)
+        if quantity <= 0:
+            raise ValueError("Quantity is zero or negative.")
+        return quantity
+    except ValueError:
+        if warn:
+            print(f"Invalid quantity for item {item.get('trade_subject', 'Unknown')}: {trade_quantity}, defaulting to 1")
+        return 1
+
+
+def offer_record(item: Dict[str, Any], warn: bool = True) -> Optional[OfferRecord]:
+    """Convert a decoded offer, or return None when its trade_money is not a number."""
+    try:
+        money = int(item.get('trade_money', 0))
+    except (TypeError, ValueError):
+        return None
+    quantity = parse_trade_quantity(item, warn)
+    return OfferRecord(
+        unit_price=money / quantity,
+        trade_money=money,
+        trade_quantity=quantity,
+        seller_id=str(item.get('seller_id') or ''),
+        trade_subject=str(item.get('trade_subject') or ''),
+        min_quantity=_to_float(item.get('min_quantity'), 1),
+        max_quantity=_to_float(item.get('max_quantity'), 99999),
+    )
+
+
+def offer_records(items: Iterable[Dict[str, Any]], warn: bool = True) -> Iterator[OfferRecord]:
+    for item in items:
+        record = offer_record(item, warn)
+        if record is not None:
+            yield record
+
+
+def _project(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: item[key] for key in OFFER_KEYS if key in item}
+
+
+def _offer_hook(obj: Dict[str, Any]) -> Dict[str, Any]:
+    # Offers are dropped down to OFFER_KEYS as soon as they are parsed, so
+    # their full dicts never pile up
+    return _project(obj) if 'trade_money' in obj else obj
+
+
+def _offers(value: Any) -> list:
+    if isinstance(value, dict):
+        value = list(value.values())
+    return [item for item in value or [] if isinstance(item, dict)]
+
+
+def decode_market_payload(content: bytes) -> Dict[str, Any]:
+    """
+    Decode an ajax_list_search response, keeping only the g/p/power offer
+    lists and OFFER_KEYS of each offer, in the response's own shape:
+    {'data': {'g': [...], 'p': [...], 'power': {...}}}.
+
+    Uses orjson when it is installed, otherwise the stdlib parser with an
+    object hook that projects offers while parsing.
+    """
+    if orjson is not None:
+        raw = orjson.loads(content)
+    else:
+        raw = json.loads(content, object_hook=_offer_hook)
+    data = raw.get('data') if isinstance(raw, dict) else None
+    if not isinstance(data, dict):
+        # PHP encodes an empty map as []
+        data = {}
+    return {
+        'data': {
+            'g': [_project(item) for item in _offers(data.get('g'))],
+            'p': [_project(item) for item in _offers(data.get('p'))],
+            'power': {str(i): _project(item) for i, item in enumerate(_offers(data.get('power')))},
+        }
+    }
@@ -0,0 +1,46 @@
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Generic, Sequence, TypeVar
+
+T = TypeVar("T")
+
+
+class MarketPrefetcher(Generic[T]):
+    """
+    Runs `fetch` for upcoming items on an executor while the caller works
+    through them in order.
+
+    Items are submitted at most `lookahead` positions ahead of the one being
+    taken, so prefetched results are never much older than when they are
+    used. `take` returns the item's future; the caller blocks on it only if
+    the fetch has not finished yet.
+    """
+
+    def __init__(
+            self,
+            executor: Executor,
+            fetch: Callable[[T], Any],
+            items: Sequence[T],
+            lookahead: int,
+    ) -> None:
+        self.executor = executor
+        self.fetch = fetch
+        self.items = items
+        self.lookahead = max(lookahead, 0)
+        self._futures: dict[int, Future] = {}
+        self._next = 0
+        self._fill(0)
+
+    def _fill(self, position: int) -> None:
+        while self._next < len(self.items) and self._next <= position + self.lookahead:
+            self._futures[self._next] = self.executor.submit(self.fetch, self.items[self._next])
+            self._next += 1
+
+    def take(self, position: int) -> Future:
+        self._fill(position)
+        return self._futures.pop(position)
+
+    def cancel(self) -> None:
+        """Drop prefetches that were not taken, e.g. when the cycle stops early."""
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
@@ -0,0 +1,76 @@
+import threading
+import time
+from typing import Any, Hashable
+
+import constants
+
+
+class _MarketState:
+    __slots__ = ("value", "interval", "next_due", "claimed")
+
+    def __init__(self, value: Any, interval: float, next_due: float) -> None:
+        self.value = value
+        self.interval = interval
+        self.next_due = next_due
+        # Set when the market is found due; the next observation clears it
+        self.claimed = False
+
+
+class MarketScheduler:
+    """
+    Adaptive polling interval per market.
+
+    Every poll records the market's observed competitor state. When it changed
+    since the previous poll the interval is halved (down to `floor`),
+    otherwise it grows by `step` (up to `ceiling`). A market is due once its
+    interval has passed since the last poll; unknown markets are always due.
+    Only the first observation after a market is found due counts, so rows
+    sharing a market do not count as extra quiet polls.
+    """
+
+    def __init__(
+            self,
+            floor: float = constants.MARKET_POLL_FLOOR,
+            ceiling: float = constants.MARKET_POLL_CEILING,
+            step: float = constants.MARKET_POLL_STEP,
+    ) -> None:
+        self.floor = floor
+        self.ceiling = max(ceiling, floor)
+        self.step = step
+        self._lock = threading.Lock()
+        self._markets: dict[Hashable, _MarketState] = {}
+
+    def is_due(self, key: Hashable) -> bool:
+        with self._lock:
+            state = self._markets.get(key)
+            if state is None:
+                return True
+            if time.monotonic() >= state.next_due:
+                state.claimed = True
+            return state.claimed
+
+    def observe(self, key: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        with self._lock:
+            state = self._markets.get(key)
+            if state is None:
+                self._markets[key] = _MarketState(value, self.floor, now + self.floor)
+                return
+            if not state.claimed:
+                return
+            if value != state.value:
+                state.interval = max(self.floor, state.interval / 2)
+            else:
+                state.interval = min(self.ceiling, state.interval + self.step)
+            state.value = value
+            state.next_due = now + state.interval
+            state.claimed = False
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            intervals = [state.interval for state in self._markets.values()]
+            return {
+                "markets": len(intervals),
+                "min_interval": min(intervals, default=0),
+                "max_interval": max(intervals, default=0),
+            }
@@ -0,0 +1,148 @@
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Tuple
+
+import constants
+from utils.market_json import OfferRecord
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS markets (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS sellers (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS subjects (id INTEGER PRIMARY KEY, text TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS offers (
+    market_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    seller_id INTEGER NOT NULL,
+    unit_price REAL NOT NULL,
+    quantity INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS offers_market_ts ON offers (market_id, ts);
+"""
+
+# (ts, seller, unit_price, quantity, subject)
+OfferRow = Tuple[int, str, float, int, str]
+
+
+class OfferHistoryStore:
+    """
+    Append-only SQLite history of market snapshots.
+
+    Each offer is one fixed-width row of integer ids and numbers; market
+    names, sellers and subjects are interned in their own tables. Rows older
+    than `retention_days` are deleted at most once per `prune_interval`
+    seconds, together with the interned names no offer refers to any more,
+    and the freed pages are returned to the file system. The connection is
+    shared between threads behind a lock.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            retention_days: float = constants.OFFER_HISTORY_RETENTION_DAYS,
+            prune_interval: float = 3600,
+    ) -> None:
+        self.retention_seconds = retention_days * 86400
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if self._conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Switching an existing database to incremental needs a VACUUM
+            self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self._conn.execute("VACUUM")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._ids: dict[str, dict[str, int]] = {"markets": {}, "sellers": {}, "subjects": {}}
+        self._pruned_at = 0.0
+
+    def _intern(self, table: str, value: str) -> int:
+        ids = self._ids[table]
+        interned = ids.get(value)
+        if interned is None:
+            column = "text" if table == "subjects" else "name"
+            self._conn.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+            interned = self._conn.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()[0]
+            ids[value] = interned
+        return interned
+
+    def record(
+            self,
+            market: str,
+            offers: Iterable[OfferRecord],
+            ts: int | None = None,
+    ) -> int:
+        """Store one snapshot of a market."""
+        ts = int(time.time()) if ts is None else ts
+        with self._lock:
+            try:
+                count = self._record(market, offers, ts)
+                if ts - self._pruned_at >= self.prune_interval:
+                    self._prune(ts)
+                return count
+            except Exception:
+                # Ids interned in the rolled back transaction are gone
+                self._clear_ids()
+                raise
+
+    def _clear_ids(self) -> None:
+        for ids in self._ids.values():
+            ids.clear()
+
+    def _record(
+            self,
+            market: str,
+            offers: Iterable[OfferRecord],
+            ts: int,
+    ) -> int:
+        with self._conn:
+            market_id = self._intern("markets", market)
+            rows = []
+            for offer in offers:
+                rows.append((
+                    market_id,
+                    ts,
+                    self._intern("sellers", offer.seller_id),
+                    offer.unit_price,
+                    offer.trade_quantity,
+                    self._intern("subjects", offer.trade_subject),
+                ))
+            self._conn.executemany("INSERT INTO offers VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def _prune(self, now: int) -> None:
+        self._pruned_at = now
+        with self._conn:
+            self._conn.execute("DELETE FROM offers WHERE ts < ?", (now - self.retention_seconds,))
+            self._conn.execute("DELETE FROM markets WHERE id NOT IN (SELECT market_id FROM offers)")
+            self._conn.execute("DELETE FROM sellers WHERE id NOT IN (SELECT seller_id FROM offers)")
+            self._conn.execute("DELETE FROM subjects WHERE id NOT IN (SELECT subject_id FROM offers)")
+        # Deleted names may be interned again under new ids
+        self._clear_ids()
+        # execute() steps the pragma once, which frees a single page;
+        # executescript() runs it to the end
+        self._conn.executescript("PRAGMA incremental_vacuum")
+
+    def query(
+            self,
+            market: str,
+            since: int,
+            until: int | None = None,
+    ) -> List[OfferRow]:
+        """Offers of a market recorded in [since, until], oldest first."""
+        until = int(time.time()) if until is None else until
+        with self._lock:
+            return self._conn.execute(
+                "SELECT o.ts, s.name, o.unit_price, o.quantity, j.text"
+                " FROM offers o"
+                " JOIN markets m ON m.id = o.market_id"
+                " JOIN sellers s ON s.id = o.seller_id"
+                " JOIN subjects j ON j.id = o.subject_id"
+                " WHERE m.name = ? AND o.ts BETWEEN ? AND ?"
+                " ORDER BY o.ts",
+                (market, since, until),
+            ).fetchall()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,87 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import constants
+
+
+class _Bucket:
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+
+class SheetsQuotaGovernor:
+    """
+    Client-side pacing for every Sheets read and write.
+
+    Each kind ("read" / "write") has a token bucket sized to its per-minute
+    budget. A caller takes a token and, if the bucket is in deficit, sleeps
+    until its own slot comes up, so queued callers are served in order instead
+    of the whole process sleeping. A 429 pauses every caller for the
+    Retry-After period.
+    """
+
+    def __init__(
+            self,
+            reads_per_minute: float = constants.SHEETS_READS_PER_MINUTE,
+            writes_per_minute: float = constants.SHEETS_WRITES_PER_MINUTE,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self.configure(reads_per_minute, writes_per_minute)
+
+    def configure(
+            self,
+            reads_per_minute: float,
+            writes_per_minute: float,
+    ) -> None:
+        with self._lock:
+            self._buckets = {
+                "read": _Bucket(reads_per_minute),
+                "write": _Bucket(writes_per_minute),
+            }
+
+    def acquire(self, kind: str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._buckets[kind]
+            bucket.refill(now)
+            bucket.tokens -= 1
+            wait = max(0.0, self._paused_until - now) + max(0.0, -bucket.tokens / bucket.rate)
+        if wait > 0:
+            time.sleep(wait)
+
+    def backoff(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            # Nothing may burst out as soon as the pause ends
+            for bucket in self._buckets.values():
+                bucket.tokens = min(bucket.tokens, 0)
+        print(f"Sheets quota hit, pausing requests for {seconds:.0f} seconds")
+
+
+def retry_after_seconds(value: str | None, default: float = constants.SHEETS_QUOTA_BACKOFF) -> float:
+    if not value:
+        return default
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+def request_kind(method: str) -> str:
+    return "read" if method.upper() == "GET" else "write"
+
+
+quota_governor = SheetsQuotaGovernor()
@@ -0,0 +1,250 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from cachetools import LRUCache
+from googleapiclient.errors import HttpError
+
+import constants
+from utils.google_api import SheetsServicePool
+from utils.revision_gate import RevisionGate
+
+# (spreadsheet_id, A1 range) of a single remote cell
+CellRef = tuple[str, str]
+
+
+def _first_value(value_range: dict[str, Any]) -> str | None:
+    try:
+        return value_range.get("values", [[]])[0][0]
+    except IndexError:
+        return None
+
+
+class RemoteCellCache:
+    """
+    Bounded LRU cache of remote cell values with a freshness TTL.
+
+    Entries older than `ttl` are still served while they are younger than
+    `ttl + stale_ttl`, and the resolver refreshes them in the background
+    (stale-while-revalidate). Counters are kept to help tune the TTL.
+    """
+
+    def __init__(
+            self,
+            maxsize: int = constants.REMOTE_CELL_CACHE_SIZE,
+            ttl: float = constants.REMOTE_CELL_CACHE_TTL,
+            stale_ttl: float = constants.REMOTE_CELL_CACHE_STALE_TTL,
+    ) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._cache: LRUCache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._refreshing: set[CellRef] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def lookup(self, ref: CellRef) -> tuple[bool, str | None, bool]:
+        """Return (found, value, is_stale) for a cell reference."""
+        with self._lock:
+            entry = self._cache.get(ref)
+            if entry is not None:
+                value, fetched_at = entry
+                age = time.monotonic() - fetched_at
+                if age < self.ttl:
+                    self.hits += 1
+                    return True, value, False
+                if age < self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    return True, value, True
+            self.misses += 1
+            return False, None, False
+
+    def peek(self, ref: CellRef) -> tuple[bool, str | None]:
+        """Return (found, value) regardless of age, without touching the counters."""
+        with self._lock:
+            entry = self._cache.get(ref)
+            if entry is None:
+                return False, None
+            return True, entry[0]
+
+    def touch(self, ref: CellRef) -> None:
+        """Mark an entry as fresh again, e.g. when its spreadsheet is known to be unchanged."""
+        with self._lock:
+            entry = self._cache.get(ref)
+            if entry is not None:
+                self._cache[ref] = (entry[0], time.monotonic())
+
+    def put(self, ref: CellRef, value: str | None) -> None:
+        with self._lock:
+            self._cache[ref] = (value, time.monotonic())
+
+    def begin_refresh(self, refs: list[CellRef]) -> list[CellRef]:
+        """Mark refs as being refreshed and return the ones not already in flight."""
+        with self._lock:
+            pending = [ref for ref in refs if ref not in self._refreshing]
+            self._refreshing.update(pending)
+            return pending
+
+    def end_refresh(self, refs: list[CellRef]) -> None:
+        with self._lock:
+            self._refreshing.difference_update(refs)
+            self.refreshes += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+            }
+
+
+class RemoteCellResolver:
+    """
+    Collects the remote cells referenced by every row of a cycle and reads them
+    with one values.batchGet per spreadsheet, spreadsheets in parallel.
+
+    When a cache is given, fresh and stale entries are served from it and only
+    misses are read inline; stale entries are refreshed in the background.
+    With a revision gate as well, cached entries of spreadsheets that did not
+    change since they were read are reused without reading them again.
+
+    Empty cells resolve to None; cells that could not be read are left out, so
+    `get` raises KeyError for them. Ranges are read one by one only when the
+    batch was rejected for a bad range (HTTP 400); any other failure leaves the
+    whole spreadsheet unread.
+
+    Reads run on a long-lived pool: SheetsServicePool keeps one keep-alive
+    service per thread, so its connections survive from one cycle to the next.
+    """
+    _fetch_executor = ThreadPoolExecutor(max_workers=constants.REMOTE_CELL_WORKERS)
+    _refresh_executor = ThreadPoolExecutor(max_workers=constants.REMOTE_CELL_WORKERS)
+
+    def __init__(
+            self,
+            credentials_file: str = "key.json",
+            cache: RemoteCellCache | None = None,
+            revision_gate: RevisionGate | None = None,
+    ) -> None:
+        self.credentials_file = credentials_file
+        self.cache = cache
+        self.revision_gate = revision_gate
+        self.refs: set[CellRef] = set()
+        self.values: dict[CellRef, str | None] = {}
+
+    def add(self, ref: CellRef | None) -> None:
+        if ref is not None:
+            self.refs.add(ref)
+
+    def resolve(self) -> None:
+        missing: list[CellRef] = []
+        stale: list[CellRef] = []
+        for ref in self.refs - self.values.keys():
+            if self.cache is None:
+                missing.append(ref)
+                continue
+            found, value, is_stale = self.cache.lookup(ref)
+            if not found:
+                missing.append(ref)
+                continue
+            self.values[ref] = value
+            if is_stale:
+                stale.append(ref)
+        if self.revision_gate is not None and (missing or stale):
+            missing, stale = self._reuse_unchanged(missing, stale)
+        if missing:
+            self.values.update(self._fetch(missing))
+        if stale:
+            pending = self.cache.begin_refresh(stale)  # type: ignore
+            if pending:
+                self._refresh_executor.submit(self._refresh, pending)
+        print(f"Resolved {len(self.values)}/{len(self.refs)} remote cells, "
+              f"{len(missing)} read, {len(stale)} stale")
+
+    def _reuse_unchanged(
+            self,
+            missing: list[CellRef],
+            stale: list[CellRef],
+    ) -> tuple[list[CellRef], list[CellRef]]:
+        unchanged = {
+            spreadsheet_id
+            for spreadsheet_id in {ref[0] for ref in missing + stale}
+            if self.revision_gate.is_unchanged(spreadsheet_id)  # type: ignore
+        }
+        still_missing: list[CellRef] = []
+        for ref in missing:
+            found, value = self.cache.peek(ref) if ref[0] in unchanged else (False, None)  # type: ignore
+            if not found:
+                still_missing.append(ref)
+                continue
+            self.values[ref] = value
+            self.cache.touch(ref)  # type: ignore
+        for ref in stale:
+            if ref[0] in unchanged:
+                self.cache.touch(ref)  # type: ignore
+        return still_missing, [ref for ref in stale if ref[0] not in unchanged]
+
+    def get(self, ref: CellRef | None) -> str | None:
+        return self.values[ref]  # type: ignore
+
+    def _refresh(self, refs: list[CellRef]) -> None:
+        try:
+            self._fetch(refs)
+        except Exception as e:
+            print(f"Error refreshing remote cells: {e}")
+        finally:
+            self.cache.end_refresh(refs)  # type: ignore
+
+    def _fetch(self, refs: list[CellRef]) -> dict[CellRef, str | None]:
+        groups: dict[str, list[str]] = {}
+        for spreadsheet_id, range_name in refs:
+            groups.setdefault(spreadsheet_id, []).append(range_name)
+        fetched: dict[CellRef, str | None] = {}
+        results = self._fetch_executor.map(self._fetch_group, groups.items())
+        for spreadsheet_id, values in zip(groups, results):
+            for range_name, value in values.items():
+                fetched[(spreadsheet_id, range_name)] = value
+                if self.cache is not None:
+                    self.cache.put((spreadsheet_id, range_name), value)
+            if self.revision_gate is not None and len(values) == len(groups[spreadsheet_id]):
+                self.revision_gate.mark_read(spreadsheet_id)
+        return fetched
+
+    def _fetch_group(self, group: tuple[str, list[str]]) -> dict[str, str | None]:
+        spreadsheet_id, ranges = group
+        values_api = SheetsServicePool.get_service(self.credentials_file).spreadsheets().values()
+        try:
+            result = values_api.batchGet(spreadsheetId=spreadsheet_id, ranges=ranges).execute()
+            return {
+                range_name: _first_value(value_range)
+                for range_name, value_range in zip(ranges, result.get("valueRanges", []))
+            }
+        except HttpError as e:
+            if e.status_code != 400:
+                print(f"Batch read failed for spreadsheet {spreadsheet_id}: {e}")
+                return {}
+            # One bad range fails the whole batch, fall back to reading them one by one
+            print(f"Batch read rejected a range of spreadsheet {spreadsheet_id}: {e}")
+        except Exception as e:
+            print(f"Batch read failed for spreadsheet {spreadsheet_id}: {e}")
+            return {}
+        values: dict[str, str | None] = {}
+        for range_name in ranges:
+            try:
+                values[range_name] = _first_value(
+                    values_api.get(spreadsheetId=spreadsheet_id, range=range_name).execute()
+                )
+            except HttpError as e:
+                print(f"Error retrieving range {range_name}: {e}")
+                if e.status_code != 400:
+                    # Quota, access or server errors hit the remaining ranges too
+                    break
+            except Exception as e:
+                print(f"Error retrieving range {range_name}: {e}")
+                break
+        return values
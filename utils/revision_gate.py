@@ -0,0 +1,70 @@
+import threading
+import time
+from typing import Callable
+
+
+class RevisionGate:
+    """
+    Skips re-reading spreadsheets that have not changed since they were last read.
+
+    `probe` returns a cheap revision marker for a spreadsheet (the Drive file
+    `version`). A spreadsheet counts as unchanged when its marker equals the one
+    recorded at the last full read, and that read is younger than
+    `max_skip_seconds`, so a missed change is picked up after that long at most.
+    """
+
+    def __init__(
+            self,
+            probe: Callable[[str], str | None],
+            max_skip_seconds: float,
+    ) -> None:
+        self.probe = probe
+        self.max_skip_seconds = max_skip_seconds
+        self._lock = threading.Lock()
+        # spreadsheet_id -> (revision at last full read, time of that read)
+        self._seen: dict[str, tuple[str, float]] = {}
+        # spreadsheet_id -> revision probed before a read that is in progress
+        self._probed: dict[str, str] = {}
+
+    def _probe(self, spreadsheet_id: str) -> str | None:
+        try:
+            return self.probe(spreadsheet_id)
+        except Exception as e:
+            print(f"Cannot get revision of {spreadsheet_id}: {e}")
+            return None
+
+    def is_unchanged(self, spreadsheet_id: str) -> bool:
+        revision = self._probe(spreadsheet_id)
+        with self._lock:
+            if revision is None:
+                self._probed.pop(spreadsheet_id, None)
+                return False
+            seen = self._seen.get(spreadsheet_id)
+            if seen is not None and seen[0] == revision and time.monotonic() - seen[1] < self.max_skip_seconds:
+                return True
+            self._probed[spreadsheet_id] = revision
+            return False
+
+    def mark_read(self, spreadsheet_id: str) -> None:
+        """Record a full read; the revision probed before it becomes the baseline."""
+        with self._lock:
+            revision = self._probed.pop(spreadsheet_id, None)
+            if revision is not None:
+                self._seen[spreadsheet_id] = (revision, time.monotonic())
+
+    def own_write(self, spreadsheet_id: str, write: Callable[[], bool]) -> bool:
+        """
+        Run a write of our own and move the baseline past it, so our own log
+        writes do not make the spreadsheet look edited. The baseline only moves
+        when nobody else changed the spreadsheet right before the write.
+        """
+        with self._lock:
+            seen = self._seen.get(spreadsheet_id)
+        before = self._probe(spreadsheet_id) if seen is not None else None
+        result = write()
+        if result and before is not None and before == seen[0]:  # type: ignore
+            after = self._probe(spreadsheet_id)
+            with self._lock:
+                if after is not None and self._seen.get(spreadsheet_id) == seen:
+                    self._seen[spreadsheet_id] = (after, seen[1])  # type: ignore
+        return result
@@ -1,3 +1,5 @@
+import hashlib
+import time
 from datetime import datetime
 
 import gspread.urls
@@ -5,31 +7,90 @@ import gspread.utils
 import gspread
 from typing import Type, Any, TypeVar
 
+import constants
 from model.sheet_model import BaseGSheetModel
-from pydantic import BaseModel, ValidationError
+from pydantic import ValidationError
+
 
 T = TypeVar("T", bound=BaseGSheetModel)
 
 
+def model_column_span(
+    models: list[Type[T]],
+) -> tuple[int, int]:
+    columns = [
+        gspread.utils.column_letter_to_index(proper.metadata[0])
+        for model in models
+        for proper in model.fields_exclude_row_index().values()
+    ]
+    return min(columns), max(columns)
+
+
+def _column_label(col_index: int) -> str:
+    return gspread.utils.rowcol_to_a1(1, col_index)[:-1]
+
+
+def _field_offsets(
+    model: Type[T],
+    first_col: int,
+) -> list[tuple[str, int]]:
+    return [
+        (field_name, gspread.utils.column_letter_to_index(proper.metadata[0]) - first_col)
+        for field_name, proper in model.fields_exclude_row_index().items()
+    ]
+
+
+def _row_cell(
+    row: list[str],
+    offset: int,
+) -> str | None:
+    # Empty cells are returned as None, the same as a single-cell batch_get
+    try:
+        value = row[offset]
+    except IndexError:
+        return None
+    return value if value != "" else None
+
+
+def _contiguous_runs(row_index: list[int]) -> list[tuple[int, int]]:
+    runs: list[tuple[int, int]] = []
+    for index in sorted(set(row_index)):
+        if runs and runs[-1][1] == index - 1:
+            runs[-1] = (runs[-1][0], index)
+        else:
+            runs.append((index, index))
+    return runs
+
+
+def _read_row_blocks(
+    worksheet: gspread.worksheet.Worksheet,
+    first_col: int,
+    last_col: int,
+    row_index: list[int],
+) -> dict[int, list[str]]:
+    """Read the column span for the given rows, one range per contiguous block of rows."""
+    runs = _contiguous_runs(row_index)
+    first_label, last_label = _column_label(first_col), _column_label(last_col)
+    ranges = [f"{first_label}{start}:{last_label}{end}" for start, end in runs]
+    rows: dict[int, list[str]] = {}
+    for (start, end), block in zip(runs, worksheet.batch_get(ranges)):
+        for offset in range(end - start + 1):
+            rows[start + offset] = block[offset] if offset < len(block) else []
+    return rows
+
+
 def query_model_from_worksheet(
     worksheet: gspread.worksheet.Worksheet,
     model: Type[T],
     row_index: list[int],
 ) -> list[T]:
-    cells: list[str] = []
-    model_fields = model.fields_exclude_row_index()
-    for index in row_index:
-        for _, propers in model_fields.items():
-            cells.append(
-                f"{propers.metadata[0]}{index}",
-            )
-    query_values = [value.first() for value in worksheet.batch_get(cells)]
+    first_col, last_col = model_column_span([model])
+    offsets = _field_offsets(model, first_col)
+    rows = _read_row_blocks(worksheet, first_col, last_col, row_index)
     model_list: list[T] = []
-    num_of_keys = len(model_fields.keys())
-    for i, index in enumerate(row_index):
-        model_dict = {}
-        for j, model_field_name in enumerate(model_fields.keys()):
-            model_dict[model_field_name] = query_values[i * num_of_keys + j]
+    for index in row_index:
+        row = rows[index]
+        model_dict = {field_name: _row_cell(row, offset) for field_name, offset in offsets}
         try:
             _model = model.model_validate(
                 model_dict,
@@ -42,27 +103,105 @@ def query_model_from_worksheet(
     return model_list
 
 
+def _merge_cell_rectangles(
+    cells: dict[tuple[int, int], Any],
+) -> list[tuple[int, int, int, int]]:
+    """
+    Merge cells into rectangles (first_row, first_col, last_row, last_col):
+    adjacent columns in a row become one run, and the same run on consecutive
+    rows is stacked into one rectangle.
+    """
+    cols_by_row: dict[int, list[int]] = {}
+    for row, col in cells:
+        cols_by_row.setdefault(row, []).append(col)
+
+    rectangles: list[tuple[int, int, int, int]] = []
+    open_runs: dict[tuple[int, int], int] = {}
+    previous_row = None
+    for row in sorted(cols_by_row):
+        runs: list[tuple[int, int]] = []
+        for col in sorted(cols_by_row[row]):
+            if runs and runs[-1][1] == col - 1:
+                runs[-1] = (runs[-1][0], col)
+            else:
+                runs.append((col, col))
+        next_open: dict[tuple[int, int], int] = {}
+        for run in runs:
+            first_row = open_runs.pop(run, None) if previous_row == row - 1 else None
+            next_open[run] = first_row if first_row is not None else row
+        for (first_col, last_col), first_row in open_runs.items():
+            rectangles.append((first_row, first_col, previous_row, last_col))  # type: ignore
+        open_runs = next_open
+        previous_row = row
+    for (first_col, last_col), first_row in open_runs.items():
+        rectangles.append((first_row, first_col, previous_row, last_col))  # type: ignore
+    return rectangles
+
+
+def _build_batch_data(
+    cells: dict[tuple[int, int], Any],
+    max_cells: int,
+    max_bytes: int,
+) -> list[list[dict[str, Any]]]:
+    """Build batch_update payloads for the cells, split into size-bounded chunks."""
+    chunks: list[list[dict[str, Any]]] = [[]]
+    chunk_cells = chunk_bytes = 0
+    for first_row, first_col, last_row, last_col in _merge_cell_rectangles(cells):
+        width = last_col - first_col + 1
+        row = first_row
+        while row <= last_row:
+            # A rectangle that does not fit in the current request is split by rows
+            values: list[list[Any]] = []
+            size = 0
+            while row <= last_row:
+                row_values = [cells[(row, col)] for col in range(first_col, last_col + 1)]
+                row_size = sum(len(str(value)) for value in row_values)
+                fits = chunk_cells + (len(values) + 1) * width <= max_cells \
+                    and chunk_bytes + size + row_size <= max_bytes
+                if not fits and (values or chunks[-1]):
+                    break
+                values.append(row_values)
+                size += row_size
+                row += 1
+            if values:
+                start = gspread.utils.rowcol_to_a1(row - len(values), first_col)
+                end = gspread.utils.rowcol_to_a1(row - 1, last_col)
+                chunks[-1].append({"range": start if start == end else f"{start}:{end}", "values": values})
+                chunk_cells += len(values) * width
+                chunk_bytes += size
+            if row <= last_row:
+                chunks.append([])
+                chunk_cells = chunk_bytes = 0
+    return [chunk for chunk in chunks if chunk]
+
+
+def batch_update_cells(
+    worksheet: gspread.worksheet.Worksheet,
+    cells: dict[tuple[int, int], Any],
+    value_input_option: gspread.utils.ValueInputOption | None = None,
+    max_cells: int = constants.SHEETS_MAX_CELLS_PER_UPDATE,
+    max_bytes: int = constants.SHEETS_MAX_BYTES_PER_UPDATE,
+) -> None:
+    """Write {(row, col): value} cells with as few ranges and requests as possible."""
+    for data in _build_batch_data(cells, max_cells, max_bytes):
+        worksheet.batch_update(data, value_input_option=value_input_option)
+
+
 def update_model_to_worksheet(
     worksheet: gspread.worksheet.Worksheet,
     models: list[T],
 ) -> None:
-    class UpdateCell(BaseModel):
-        range: str
-        values: Any
-
-    data = []
+    cells: dict[tuple[int, int], Any] = {}
+    columns_by_model: dict[type, list[tuple[str, int]]] = {}
     for model in models:
-        model_fields = model.fields_exclude_row_index()
+        columns = columns_by_model.get(type(model))
+        if columns is None:
+            columns = columns_by_model[type(model)] = _field_offsets(type(model), 0)
         model_dict = model.model_dump(mode="json")
-        for field_name, proper in model_fields.items():
-            data.append(
-                UpdateCell(
-                    range=f"{proper.metadata[0]}{model.row_index}",
-                    values=[[model_dict[field_name]]],
-                ).model_dump()
-            )
+        for field_name, col_index in columns:
+            cells[(model.row_index, col_index)] = model_dict[field_name]  # type: ignore
 
-    worksheet.batch_update(data)
+    batch_update_cells(worksheet, cells)
 
 
 def query_multi_model_from_worksheet(
@@ -70,22 +209,11 @@ def query_multi_model_from_worksheet(
     models: list[Type[T]],
     row_index: int,
 ) -> list[Type[T]]:
-    cells: list[str] = []
-    for model in models:
-        model_fields = model.fields_exclude_row_index()
-        for _, proper in model_fields.items():
-            cells.append(
-                f"{proper.metadata[0]}{row_index}",
-            )
-    query_values = [value.first() for value in worksheet.batch_get(cells)]
+    first_col, last_col = model_column_span(models)
+    row = _read_row_blocks(worksheet, first_col, last_col, [row_index])[row_index]
     result_model = []
-    count: int = 0
     for i, model in enumerate(models):
-        model_dict = {}
-        model_fields = model.fields_exclude_row_index()
-        for j, field_name in enumerate(model_fields.keys()):
-            model_dict[field_name] = query_values[count]
-            count += 1
+        model_dict = {field_name: _row_cell(row, offset) for field_name, offset in _field_offsets(model, first_col)}
         try:
             _model = model.model_validate(model_dict)
             _model.row_index = row_index
@@ -95,6 +223,147 @@ def query_multi_model_from_worksheet(
     return result_model
 
 
+class WorksheetSnapshot:
+    """
+    In-memory copy of the column block used by a set of models, read with a
+    single values call so building every row model costs no extra requests.
+    """
+
+    def __init__(
+        self,
+        worksheet: gspread.worksheet.Worksheet,
+        first_col: int,
+        values: list[list[str]],
+    ) -> None:
+        self.worksheet = worksheet
+        self.first_col = first_col
+        self.values = values
+
+    @staticmethod
+    def read(
+        worksheet: gspread.worksheet.Worksheet,
+        models: list[Type[T]],
+    ) -> "WorksheetSnapshot":
+        first_col, last_col = model_column_span(models)
+        values = worksheet.get(f"{_column_label(first_col)}:{_column_label(last_col)}")
+        return WorksheetSnapshot(worksheet, first_col, values)
+
+    def cell(
+        self,
+        row_index: int,
+        col_index: int,
+    ) -> str | None:
+        try:
+            row = self.values[row_index - 1]
+        except IndexError:
+            return None
+        return _row_cell(row, col_index - self.first_col)
+
+    def row_digest(
+        self,
+        row_index: int,
+        models: list[Type[T]],
+    ) -> str:
+        # Only the models' own columns count: the log columns in the block are
+        # rewritten every cycle and must not change the digest
+        try:
+            row = self.values[row_index - 1]
+        except IndexError:
+            row = []
+        cells = [
+            _row_cell(row, offset) or ""
+            for model in models
+            for _, offset in _field_offsets(model, self.first_col)
+        ]
+        return hashlib.blake2b("\x1f".join(cells).encode(), digest_size=16).hexdigest()
+
+    def col_values(
+        self,
+        col_index: int,
+    ) -> list[str | None]:
+        return [self.cell(row_index, col_index) for row_index in range(1, len(self.values) + 1)]
+
+
+def query_multi_model_from_snapshot(
+    snapshot: WorksheetSnapshot,
+    models: list[Type[T]],
+    row_index: int,
+) -> list[T]:
+    result_model = []
+    for model in models:
+        model_dict = {}
+        for field_name, offset in _field_offsets(model, snapshot.first_col):
+            model_dict[field_name] = snapshot.cell(row_index, snapshot.first_col + offset)
+        try:
+            _model = model.model_validate(model_dict)
+            _model.row_index = row_index
+            result_model.append(_model)
+        except ValidationError as e:
+            raise ValueError(f"Validate error for {model} in row_index: {row_index}: {e}") from e
+    return result_model
+
+
+class SheetWriteBuffer:
+    """
+    Collects cell updates for one worksheet and sends them in a single
+    batch_update. Only the latest value per cell is kept, and cells stay
+    buffered until a flush succeeds.
+    """
+
+    def __init__(
+        self,
+        worksheet: gspread.worksheet.Worksheet,
+        flush_rows: int = 0,
+        flush_seconds: float = 0,
+    ) -> None:
+        self.worksheet = worksheet
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.cells: dict[tuple[int, int], Any] = {}
+        self._last_flush = time.monotonic()
+
+    def update_cell(
+        self,
+        row: int,
+        col: int,
+        value: Any,
+    ) -> None:
+        self.cells[(row, col)] = value
+
+    def merge(
+        self,
+        older: "SheetWriteBuffer",
+    ) -> None:
+        # Values already buffered here are newer and win over the older buffer
+        for key, value in older.cells.items():
+            self.cells.setdefault(key, value)
+
+    def is_due(self) -> bool:
+        if not self.cells:
+            return False
+        if self.flush_rows and len({row for row, _ in self.cells}) >= self.flush_rows:
+            return True
+        if self.flush_seconds and time.monotonic() - self._last_flush >= self.flush_seconds:
+            return True
+        return False
+
+    def flush(self) -> bool:
+        if not self.cells:
+            return True
+        try:
+            batch_update_cells(
+                self.worksheet,
+                self.cells,
+                value_input_option=gspread.utils.ValueInputOption.user_entered,
+            )
+        except Exception as e:
+            print(f"Error flushing {len(self.cells)} buffered cells: {e}")
+            return False
+        self.cells.clear()
+        self._last_flush = time.monotonic()
+        return True
+
+
 def update_string_to_worksheet(
     worksheet: gspread.worksheet.Worksheet,
     cell: str,